@@ -1,8 +1,9 @@
 from django.contrib import admin
-from .models import Club, Player, Opposition, Match, MatchPlayer
+from .models import Club, Player, Opposition, Match, MatchPlayer, Job
 
 admin.site.register(Club)
 admin.site.register(Player)
 admin.site.register(Opposition)
 admin.site.register(Match)
-admin.site.register(MatchPlayer)
\ No newline at end of file
+admin.site.register(MatchPlayer)
+admin.site.register(Job)
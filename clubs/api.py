@@ -0,0 +1,228 @@
+"""
+Read-only JSON API for fixtures, players and match rosters.
+
+Every endpoint runs a fixed number of queries whatever the page size:
+rows are fetched with .values() for just the requested fields, and list
+endpoints use keyset (cursor) pagination rather than OFFSET.
+
+    ?fields=id,date,opposition_name   only return these fields
+    ?limit=50                         page size (max 200)
+    ?cursor=...                       next_cursor from the previous page
+
+POST api/availability/ is the one write endpoint: a batch of availability
+and selection changes applied in a single transaction.
+"""
+import base64
+import json
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_POST
+
+from .models import Match, Player
+from .services import apply_availability_batch, roster_queryset
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+MAX_BATCH = 1000
+
+# API field -> ORM path
+MATCH_FIELDS = {
+    'id': 'id',
+    'date': 'date',
+    'time': 'time',
+    'venue': 'venue',
+    'is_home': 'is_home',
+    'status': 'status',
+    'match_fee': 'match_fee',
+    'opposition_id': 'opposition_id',
+    'opposition_name': 'opposition__name',
+    'selected_count': 'selected_count',
+    'available_count': 'available_count',
+    'maybe_count': 'maybe_count',
+    'unavailable_count': 'unavailable_count',
+    'awaiting_count': 'awaiting_count',
+    'my_availability': 'my_availability',
+    'is_selected': 'is_selected',
+    'updated_at': 'updated_at',
+}
+
+PLAYER_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'role': 'role',
+    'email': 'email',
+    'phone': 'phone',
+    'is_linked': 'is_linked',
+}
+
+ROSTER_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'role': 'role',
+    'availability': 'match_availability',
+    'selected': 'match_selected',
+}
+
+
+class ApiError(Exception):
+    """Bad request parameters - returned to the client as a 400"""
+
+
+def api_view(view):
+    """JSON errors instead of redirects, and 400s for bad parameters"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'error': 'Authentication required.'}, status=401)
+        if request.membership.player is None:
+            return JsonResponse(
+                {'error': 'You are not a member of a club.'}, status=403)
+        try:
+            data = view(request, *args, **kwargs)
+        except ApiError as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        except Http404:
+            return JsonResponse({'error': 'Not found.'}, status=404)
+        return JsonResponse(data, encoder=DjangoJSONEncoder)
+    return wrapper
+
+
+def select_fields(request, available):
+    """Requested ?fields= (default all) mapped to their ORM paths"""
+    requested = request.GET.get('fields')
+    if not requested:
+        return dict(available)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(f"Unknown field(s): {', '.join(unknown)}")
+    return {name: available[name] for name in names}
+
+
+def values_for(queryset, fields):
+    """.values() for just these fields, renamed to their API names"""
+    plain = [name for name, path in fields.items() if name == path]
+    renamed = {
+        name: F(path) for name, path in fields.items() if name != path}
+    return queryset.values(*plain, **renamed)
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([value, pk], cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor, field):
+    """(value, pk) from a cursor, with value converted for field.
+
+    Cursors come from the client, so anything that isn't a string value
+    the field accepts and an integer pk is rejected with a 400.
+    """
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(value, str) or type(pk) is not int:
+            raise TypeError
+        return field.to_python(value), pk
+    except (ValueError, TypeError, ValidationError):
+        raise ApiError('Invalid cursor.')
+
+
+def page_limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit must be a number.')
+    return max(1, min(limit, MAX_LIMIT))
+
+
+def keyset_page(request, queryset, fields, order_field):
+    """One page ordered by (order_field, id), after ?cursor= if given"""
+    cursor = request.GET.get('cursor')
+    if cursor:
+        value, pk = decode_cursor(
+            cursor, queryset.model._meta.get_field(order_field))
+        queryset = queryset.filter(
+            Q(**{f'{order_field}__gt': value})
+            | Q(**{order_field: value, 'pk__gt': pk}))
+    limit = page_limit(request)
+
+    # The ordering keys are always fetched so the next cursor can be built
+    query_fields = dict(fields)
+    query_fields.setdefault('id', 'id')
+    query_fields.setdefault(order_field, order_field)
+    rows = list(
+        values_for(queryset, query_fields)
+        .order_by(order_field, 'pk')[:limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last[order_field], last['id'])
+    for row in rows:
+        for key in set(row) - set(fields):
+            del row[key]
+    return {'results': rows, 'next_cursor': next_cursor}
+
+
+@api_view
+def match_list(request):
+    """The user's club fixtures, by date"""
+    player = request.membership.player
+    fields = select_fields(request, MATCH_FIELDS)
+    matches = Match.objects.for_club(
+        player.club_id).with_player_status(player)
+    return keyset_page(request, matches, fields, 'date')
+
+
+@api_view
+def player_list(request):
+    """Active players of the user's club, by name"""
+    player = request.membership.player
+    fields = select_fields(request, PLAYER_FIELDS)
+    players = Player.objects.for_club(player.club_id).active().annotate(
+        is_linked=Q(user__isnull=False),
+    )
+    return keyset_page(request, players, fields, 'name')
+
+
+@api_view
+def match_roster(request, pk):
+    """Every active club player with their response for one match"""
+    match = get_object_or_404(
+        Match.objects.only('pk', 'club_id'),
+        pk=pk, club_id__in=list(request.membership.by_club))
+    fields = select_fields(request, ROSTER_FIELDS)
+    rows = values_for(roster_queryset(match), fields).order_by('name', 'pk')
+    return {'match': match.pk, 'results': list(rows)}
+
+
+@require_POST
+@api_view
+def availability_batch(request):
+    """Apply many availability/selection changes in one transaction.
+
+    Body: {"items": [{"match": 1, "player": 2, "availability": "yes",
+    "selected": true}, ...]}. Returns a result per item, in order.
+    """
+    try:
+        items = json.loads(request.body)['items']
+    except (ValueError, KeyError, TypeError):
+        raise ApiError('Body must be JSON with an "items" list.')
+    if not isinstance(items, list) or not all(
+            isinstance(item, dict) for item in items):
+        raise ApiError('"items" must be a list of objects.')
+    if len(items) > MAX_BATCH:
+        raise ApiError(f'At most {MAX_BATCH} items per request.')
+
+    results = apply_availability_batch(request.membership, items)
+    return {
+        'updated': sum(result['ok'] for result in results),
+        'results': results,
+    }
@@ -7,3 +7,4 @@ class ClubsConfig(AppConfig):
 
     def ready(self):
         import clubs.signals  # noqa: F401
+        import clubs.tasks  # noqa: F401
@@ -0,0 +1,169 @@
+"""
+Query-count and latency benchmarks for every clubs route.
+
+Not collected by the normal test run - run explicitly with:
+
+    python manage.py test clubs.benchmarks
+
+Each route is requested against seeded clubs of increasing size. The JSON
+report (BENCHMARK_REPORT, default benchmark_report.json) records query
+count, total SQL time and wall time per view so runs can be compared
+between commits. The test fails if a view's query count grows with squad
+or fixture size.
+
+The team suggester is timed separately, on a 200-player club late in a
+long season, and must answer within SUGGESTION_BUDGET_MS.
+"""
+import json
+import os
+import statistics
+import time
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Club, Match, Player
+from .selection import suggest_team
+from .urls import urlpatterns
+
+# (players per club, matches per club) for each seeded club
+SIZES = [(12, 5), (40, 30)]
+
+# Views known to scale with data size - remove once fixed
+KNOWN_SCALING = set()
+
+# Write-only routes, which answer GET with 405
+POST_ONLY = {
+    'api_availability_batch', 'switch_club', 'request_availability',
+}
+
+SUGGESTION_PLAYERS = 200
+SUGGESTION_MATCHES = 22
+SUGGESTION_BUDGET_MS = 50
+
+
+def route_kwargs(pattern, club, admin):
+    """URL kwargs for a clubs route, pointing at the seeded club's data"""
+    match = club.matches.order_by('pk').first()
+    # <pk> refers to the object named at the start of the route name
+    pks = {
+        'club': club.pk,
+        'player': admin.pk,
+        'opposition': club.oppositions.order_by('pk').first().pk,
+        'match': match.pk,
+    }
+    values = {
+        'club_pk': club.pk,
+        'match_pk': match.pk,
+        'player_pk': admin.pk,
+        'availability': 'yes',
+    }
+    kwargs = {}
+    for key in pattern.pattern.converters:
+        if key == 'pk':
+            kwargs[key] = pks[pattern.name.removeprefix('api_').split('_')[0]]
+        else:
+            kwargs[key] = values[key]
+    return kwargs
+
+
+class ViewBenchmarks(TestCase):
+
+    def seed_club(self, players, matches):
+        """Seed one club and return it with its (logged in) admin"""
+        call_command(
+            'seed_load', users=3, clubs=1, players=players,
+            oppositions=4, matches=matches, response_rate=0.9,
+            stdout=StringIO())
+        club = Club.objects.order_by('-pk').first()
+        admin = Player.objects.get(club=club, role='admin')
+        # Staff too, so staff-only routes are measured as well
+        admin.user.is_staff = True
+        admin.user.save()
+        self.client.force_login(admin.user)
+        return club, admin
+
+    def measure(self, url):
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = self.client.get(url)
+            if response.streaming:
+                # Streamed rows are only queried as the body is read
+                b''.join(response.streaming_content)
+            wall = time.perf_counter() - start
+        self.assertLess(response.status_code, 400, url)
+        queries = context.captured_queries
+        return {
+            'queries': len(queries),
+            'sql_ms': round(
+                sum(float(q['time']) for q in queries) * 1000, 3),
+            'wall_ms': round(wall * 1000, 3),
+        }
+
+    def test_views_scale_with_constant_queries(self):
+        report = {'database': connection.vendor, 'views': {}}
+
+        for players, matches in SIZES:
+            club, admin = self.seed_club(players, matches)
+            for pattern in urlpatterns:
+                name = pattern.name
+                if name in POST_ONLY:
+                    continue
+                url = reverse(
+                    name, kwargs=route_kwargs(pattern, club, admin))
+                # Warm up per-process caches (content types, sites)
+                self.client.get(url)
+                result = self.measure(url)
+                result.update(players=players, matches=matches)
+                report['views'].setdefault(name, []).append(result)
+
+        path = os.environ.get('BENCHMARK_REPORT', 'benchmark_report.json')
+        with open(path, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+
+        for name, results in report['views'].items():
+            if name in KNOWN_SCALING:
+                continue
+            counts = [result['queries'] for result in results]
+            self.assertLessEqual(
+                max(counts), counts[0],
+                f'{name} query count grows with data size: {counts}')
+
+
+class SuggestionBenchmarks(TestCase):
+
+    def test_suggestion_for_large_club_is_fast(self):
+        call_command(
+            'seed_load', users=3, clubs=1, players=SUGGESTION_PLAYERS,
+            oppositions=4, matches=SUGGESTION_MATCHES, response_rate=0.9,
+            stdout=StringIO())
+        # The last match of the season has the most history behind it
+        match = Match.objects.order_by('-date').first()
+        match.match_players.update(selected=False)
+
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as context:
+                picks = suggest_team(match)
+            timings.append((time.perf_counter() - start) * 1000)
+        median = statistics.median(timings)
+
+        path = os.environ.get(
+            'SUGGESTION_REPORT', 'suggestion_benchmark.json')
+        with open(path, 'w') as report_file:
+            json.dump({
+                'database': connection.vendor,
+                'players': SUGGESTION_PLAYERS,
+                'matches': SUGGESTION_MATCHES,
+                'queries': len(context.captured_queries),
+                'median_ms': round(median, 3),
+            }, report_file, indent=2)
+
+        self.assertEqual(len(picks), 11)
+        self.assertEqual(len(context.captured_queries), 2)
+        self.assertLess(median, SUGGESTION_BUDGET_MS)
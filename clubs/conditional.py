@@ -0,0 +1,131 @@
+"""
+ETag / Last-Modified support for the match pages.
+
+Every change that affects a match page moves Match.updated_at on, whether
+the change is to the match itself, its roster, or the players,
+opposition or club it shows. So one aggregate over the Match rows tells
+us whether a page can be answered with 304 Not Modified, before any
+roster query or template rendering happens.
+"""
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.middleware.csrf import get_token
+from django.views.decorators.http import condition
+
+from .models import Match
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def _viewer(request):
+    """Parts of the page that depend on who is looking.
+
+    Includes the CSRF secret, which is rotated on login: the pages carry
+    forms whose tokens would be rejected if a cached copy from an earlier
+    login were reused.
+    """
+    # get_token() makes sure a secret exists before the page is rendered
+    get_token(request)
+    csrf = request.META['CSRF_COOKIE']
+    player = request.membership.player
+    if player is None:
+        return f'none:{csrf}'
+    return (
+        f'{request.user.pk}:{player.pk}:{player.club_id}:'
+        f'{request.membership.is_admin_or_captain(player.club_id)}:{csrf}')
+
+
+def _summarise(request, summary):
+    """Turn a count/latest aggregate into (etag, last_modified)"""
+    if summary['latest'] is None:
+        return (None, None)
+    raw = (
+        f"{_viewer(request)}:{summary['count']}:"
+        f"{summary['latest'].isoformat()}")
+    etag = hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest()
+    return (etag, summary['latest'])
+
+
+def _state(request, matches):
+    """(etag, last_modified) for a set of matches - one query, cached on
+    the request since Django asks for each value separately"""
+    if not hasattr(request, '_match_state'):
+        request._match_state = (None, None)
+        # Pending flash messages must be rendered, never answered with 304
+        if not len(messages.get_messages(request)):
+            request._match_state = _summarise(request, matches.aggregate(
+                count=Count('pk'), latest=Max('updated_at')))
+    return request._match_state
+
+
+async def _astate(request, matches):
+    """_state() with the async ORM, for async views"""
+    if not hasattr(request, '_match_state'):
+        request._match_state = (None, None)
+        if not len(messages.get_messages(request)):
+            request._match_state = _summarise(
+                request, await matches.aaggregate(
+                    count=Count('pk'), latest=Max('updated_at')))
+    return request._match_state
+
+
+def _club_matches(request, **kwargs):
+    player = request.membership.player
+    club_id = player.club_id if player else None
+    return Match.objects.for_club(club_id)
+
+
+def _one_match(request, pk=None, **kwargs):
+    return Match.objects.filter(pk=pk)
+
+
+def _match_condition(matches_for):
+    """condition() for views showing the matches matches_for() returns.
+
+    Works on sync and async views. For async views the state is worked
+    out with the async ORM first, so condition() only reads it back.
+    Only GET and HEAD are checked: a view that also takes a POST must
+    never have the write skipped, or refused with 412, by a stale
+    If-Match or If-Unmodified-Since.
+    """
+    def state(request, *args, **kwargs):
+        return _state(request, matches_for(request, **kwargs))
+
+    checked = condition(
+        etag_func=lambda request, *args, **kwargs: (
+            state(request, *args, **kwargs)[0]),
+        last_modified_func=lambda request, *args, **kwargs: (
+            state(request, *args, **kwargs)[1]),
+    )
+
+    def decorator(view):
+        checked_view = checked(view)
+        if not iscoroutinefunction(view):
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                if request.method not in SAFE_METHODS:
+                    return view(request, *args, **kwargs)
+                return checked_view(request, *args, **kwargs)
+            return inner
+
+        @wraps(view)
+        async def ainner(request, *args, **kwargs):
+            if request.method not in SAFE_METHODS:
+                return await view(request, *args, **kwargs)
+            await request.amembership()
+            await _astate(request, matches_for(request, **kwargs))
+            return await checked_view(request, *args, **kwargs)
+        return ainner
+    return decorator
+
+
+# For views listing all of the user's club matches
+club_matches_condition = _match_condition(_club_matches)
+
+# For views showing a single match (url kwarg pk)
+match_condition = _match_condition(_one_match)
@@ -1,9 +1,9 @@
-from .models import Player
-
-
 def player_context(request):
-    """Add current player to all templates"""
+    """Add current player (and the user's memberships) to all templates"""
     if request.user.is_authenticated:
-        player = Player.objects.filter(user=request.user).first()
-        return {'current_player': player}
-    return {}
\ No newline at end of file
+        # Loaded once per request by MembershipMiddleware
+        return {
+            'current_player': request.membership.player,
+            'membership': request.membership,
+        }
+    return {}
@@ -0,0 +1,136 @@
+"""
+Season availability export: a players x matches grid as CSV.
+
+The grid is streamed a player at a time. One query fetches the season's
+fixtures for the header; a second, ordered by player, LEFT JOINs every
+club player to their MatchPlayer rows for those fixtures and is read
+with .iterator(), which uses a server-side cursor on PostgreSQL. Only
+one player's row is held in memory at a time, however large the club.
+
+Under ASGI a sync iterator would be read in full before the first byte
+is sent, so there the rows are handed over by an async generator that
+advances the same cursor on the database thread, CHUNK_SIZE rows at a
+time.
+"""
+import csv
+from datetime import MAXYEAR, MINYEAR
+from itertools import groupby, islice
+
+from asgiref.sync import sync_to_async
+
+from django.core.exceptions import PermissionDenied
+from django.contrib.auth.decorators import login_required
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import FilteredRelation, Q
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+
+from .models import Club, Match, Player
+
+# Rows fetched from the cursor per round trip
+CHUNK_SIZE = 2000
+
+# Cell text for unselected players; no response is left blank
+CELL_LABELS = {
+    'yes': 'Available',
+    'maybe': 'Maybe',
+    'no': 'Unavailable',
+}
+
+
+class Echo:
+    """File-like object whose write() hands the line back to csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def season_matches(club, season):
+    """The club's fixtures in a season (calendar year), by date"""
+    return list(
+        Match.objects.for_club(club.pk).filter(date__year=season)
+        .select_related('opposition').order_by('date', 'time', 'pk'))
+
+
+def matrix_cursor(club, match_ids):
+    """(player id, name, match id, availability, selected) rows.
+
+    Players come out in name order, each with one row per response in
+    match_ids (or a single row of Nones if they have none). Inactive
+    players are only included if they responded during the season.
+    """
+    return Player.objects.for_club(club.pk).annotate(
+        season_response=FilteredRelation(
+            'match_appearances',
+            condition=Q(match_appearances__match_id__in=match_ids),
+        ),
+    ).filter(
+        Q(is_active=True) | Q(season_response__isnull=False)
+    ).order_by('name', 'pk').values_list(
+        'pk', 'name', 'season_response__match_id',
+        'season_response__availability', 'season_response__selected',
+    ).iterator(chunk_size=CHUNK_SIZE)
+
+
+def cell(availability, selected):
+    if selected:
+        return 'Selected'
+    return CELL_LABELS.get(availability, '')
+
+
+def matrix_rows(club, season):
+    """Header then one row per player, generated lazily"""
+    matches = season_matches(club, season)
+    yield ['Player'] + [
+        f'{match.date:%d/%m} vs {match.opposition.name}'
+        for match in matches
+    ]
+    columns = {match.pk: index for index, match in enumerate(matches)}
+    rows = matrix_cursor(club, list(columns))
+    for (player_id, name), responses in groupby(
+            rows, key=lambda row: row[:2]):
+        cells = [''] * len(columns)
+        for _, _, match_id, availability, selected in responses:
+            if match_id is not None:
+                cells[columns[match_id]] = cell(availability, selected)
+        yield [name] + cells
+
+
+async def amatrix_rows(club, season):
+    """matrix_rows() for ASGI, fetched a batch of rows per thread hop"""
+    rows = matrix_rows(club, season)
+    next_batch = sync_to_async(lambda: list(islice(rows, CHUNK_SIZE)))
+    while batch := await next_batch():
+        for row in batch:
+            yield row
+
+
+async def _awrite(writer, rows):
+    async for row in rows:
+        yield writer.writerow(row)
+
+
+@login_required
+def availability_export(request, club_pk):
+    """Stream a season's availability/selection grid as CSV"""
+    club = get_object_or_404(Club, pk=club_pk)
+    # Permission check - only admin/captain can export
+    if not request.membership.is_admin_or_captain(club.pk):
+        raise PermissionDenied
+    try:
+        season = int(request.GET.get('season', timezone.now().year))
+        if not MINYEAR <= season <= MAXYEAR:
+            raise ValueError
+    except ValueError:
+        season = timezone.now().year
+
+    writer = csv.writer(Echo())
+    if isinstance(request, ASGIRequest):
+        lines = _awrite(writer, amatrix_rows(club, season))
+    else:
+        lines = (writer.writerow(row) for row in matrix_rows(club, season))
+    response = StreamingHttpResponse(lines, content_type='text/csv')
+    response['Content-Disposition'] = (
+        f'attachment; filename="availability-{club.pk}-{season}.csv"')
+    return response
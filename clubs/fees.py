@@ -0,0 +1,140 @@
+"""
+Match fee ledger: charges for selected players, payments against them.
+
+While a match is completed, every selected player has a FeeCharge for
+the match fee (or the club default). sync_match_fees() keeps it that way:
+it runs when a match is saved and whenever its team changes, charging
+players added to the team and voiding the charges of players taken off
+it, and bringing existing charges up to date if the fee was changed.
+Reopening or deleting the match voids all its charges. Payments are
+recorded with record_payment().
+
+Each player's running balance lives on Player.fee_balance and is moved on
+by the same transaction that writes the ledger, so the outstanding fees
+page is one indexed read of Player rather than a sum over every match.
+"""
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+
+from .models import FeeCharge, FeePayment, Match, MatchPlayer, Player
+
+
+def match_fee(match):
+    """The fee for a match, falling back to the club default"""
+    if match.match_fee is not None:
+        return match.match_fee
+    return match.club.default_match_fee
+
+
+def _lock_match(match):
+    """Lock the match so two writers can't charge the same players"""
+    list(Match.objects.select_for_update().filter(
+        pk=match.pk).values_list('pk'))
+
+
+def _selected(match):
+    """Subquery: the charged player is in the match's team"""
+    return Exists(MatchPlayer.objects.filter(
+        match=match, player=OuterRef('player'), selected=True))
+
+
+def charge_match_fees(match):
+    """Charge the match fee to selected players not yet charged for it.
+
+    Safe to call again: players already charged are skipped. Returns the
+    number of charges made.
+    """
+    fee = match_fee(match)
+    if not fee:
+        return 0
+    with transaction.atomic():
+        _lock_match(match)
+        player_ids = list(match.match_players.filter(
+            selected=True
+        ).exclude(
+            Exists(FeeCharge.objects.filter(
+                match=match, player=OuterRef('player')))
+        ).values_list('player_id', flat=True))
+        if not player_ids:
+            return 0
+        FeeCharge.objects.bulk_create([
+            FeeCharge(match=match, player_id=player_id, amount=fee)
+            for player_id in player_ids
+        ])
+        Player.objects.filter(pk__in=player_ids).update(
+            fee_balance=F('fee_balance') + fee)
+    return len(player_ids)
+
+
+def void_match_fees(match, unselected_only=False):
+    """Delete a match's charges and take them off the players' balances.
+
+    With unselected_only, only the charges of players no longer in the
+    team are voided. Returns the number of charges voided.
+    """
+    with transaction.atomic():
+        charges = FeeCharge.objects.filter(match=match)
+        if unselected_only:
+            _lock_match(match)
+            charges = charges.exclude(_selected(match))
+        player_ids = list(charges.values_list('player_id', flat=True))
+        if not player_ids:
+            return 0
+        charges.filter(player_id__in=player_ids).delete()
+        Player.objects.filter(pk__in=player_ids).refresh_balances()
+    return len(player_ids)
+
+
+def reprice_match_fees(match):
+    """Bring a match's charges up to its current fee.
+
+    A fee changed to nothing voids them. Returns the number of charges
+    changed.
+    """
+    fee = match_fee(match)
+    if not fee:
+        return void_match_fees(match)
+    with transaction.atomic():
+        _lock_match(match)
+        charges = FeeCharge.objects.filter(match=match).exclude(amount=fee)
+        player_ids = list(charges.values_list('player_id', flat=True))
+        if not player_ids:
+            return 0
+        charges.filter(player_id__in=player_ids).update(amount=fee)
+        Player.objects.filter(pk__in=player_ids).refresh_balances()
+    return len(player_ids)
+
+
+def sync_match_fees(match):
+    """Make a match's charges match its team.
+
+    A completed match charges its selected players at its current fee
+    and voids the charges of anyone taken off the team; any other match
+    has no charges. Returns the number of charges made, changed or voided.
+    """
+    if match.status != 'completed':
+        return void_match_fees(match)
+    with transaction.atomic():
+        return (void_match_fees(match, unselected_only=True)
+                + reprice_match_fees(match)
+                + charge_match_fees(match))
+
+
+def sync_team_fees(match_ids):
+    """sync_match_fees() for the completed ones of match_ids, after
+    their teams changed"""
+    synced = 0
+    for match in Match.objects.filter(
+            pk__in=match_ids, status='completed').select_related('club'):
+        synced += sync_match_fees(match)
+    return synced
+
+
+def record_payment(player, amount, user=None, note=''):
+    """Record a payment and take it off the player's balance"""
+    with transaction.atomic():
+        payment = FeePayment.objects.create(
+            player=player, amount=amount, note=note, recorded_by=user)
+        Player.objects.filter(pk=player.pk).update(
+            fee_balance=F('fee_balance') - amount)
+    return payment
@@ -1,5 +1,5 @@
 from django import forms
-from .models import Club, Player, Opposition, Match
+from .models import Club, Player, Opposition, Match, FeePayment
 
 
 class ClubForm(forms.ModelForm):
@@ -18,6 +18,11 @@ class PlayerForm(forms.ModelForm):
         }
 
 
+class PlayerImportForm(forms.Form):
+    """Upload a CSV of players (name, email, phone, role columns)"""
+    file = forms.FileField(label='CSV file')
+
+
 class OppositionForm(forms.ModelForm):
     """Form for creating and editing opposition teams"""
     class Meta:
@@ -52,3 +57,68 @@ class MatchForm(forms.ModelForm):
     def clean_is_home(self):
         """Convert string to boolean"""
         return self.cleaned_data['is_home'] == 'True'
+
+
+class FixtureSeriesForm(forms.Form):
+    """Form for scheduling a run of weekly matches in one go"""
+
+    # Longest series created at once (about two seasons of weekly games)
+    MAX_MATCHES = 60
+
+    first_date = forms.DateField(
+        widget=forms.DateInput(attrs={'type': 'date'}))
+    last_date = forms.DateField(
+        widget=forms.DateInput(attrs={'type': 'date'}))
+    every_weeks = forms.IntegerField(
+        min_value=1, max_value=4, initial=1, label='Every (weeks)')
+    oppositions = forms.ModelMultipleChoiceField(
+        queryset=Opposition.objects.none(),
+        widget=forms.CheckboxSelectMultiple,
+        help_text='Played in turn, in the order listed.')
+    first_is_home = forms.ChoiceField(
+        choices=MatchForm.HOME_AWAY_CHOICES,
+        widget=forms.RadioSelect,
+        initial=True,
+        label='First match',
+        help_text='Home and away then alternate.')
+    time = forms.TimeField(
+        required=False, widget=forms.TimeInput(attrs={'type': 'time'}))
+    match_fee = forms.DecimalField(
+        max_digits=5, decimal_places=2, required=False)
+
+    def __init__(self, *args, club, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['oppositions'].queryset = Opposition.objects.for_club(
+            club.pk)
+
+    def clean_first_is_home(self):
+        """Convert string to boolean"""
+        return self.cleaned_data['first_is_home'] == 'True'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        first = cleaned_data.get('first_date')
+        last = cleaned_data.get('last_date')
+        weeks = cleaned_data.get('every_weeks')
+        if first and last and weeks:
+            if last < first:
+                raise forms.ValidationError(
+                    'The last date must not be before the first.')
+            if (last - first).days // (7 * weeks) >= self.MAX_MATCHES:
+                raise forms.ValidationError(
+                    f'A series can have at most {self.MAX_MATCHES} matches.')
+        return cleaned_data
+
+
+class PaymentForm(forms.ModelForm):
+    """Form for recording a fee payment"""
+    class Meta:
+        model = FeePayment
+        fields = ['amount', 'note']
+
+    def clean_amount(self):
+        """Payments must be positive"""
+        amount = self.cleaned_data['amount']
+        if amount <= 0:
+            raise forms.ValidationError('Enter an amount above zero.')
+        return amount
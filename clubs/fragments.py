@@ -0,0 +1,71 @@
+import hashlib
+
+from django.core.cache import caches
+from django.core.cache.backends.base import InvalidCacheBackendError
+
+STATS_KEYS = {'hit': 'fragment-stats:hits', 'miss': 'fragment-stats:misses'}
+
+
+def fragment_cache():
+    """The 'fragments' cache if configured, otherwise the default cache"""
+    try:
+        return caches['fragments']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def match_fragment_key(name, match, vary_on=()):
+    """Cache key for a rendered fragment of a match.
+
+    Includes the match's cache_version, so any change to the match or its
+    roster moves to a new key instead of deleting old ones. created_at
+    guards against a reused primary key picking up a deleted match's
+    fragments.
+    """
+    vary = hashlib.md5(
+        ':'.join(str(value) for value in vary_on).encode(),
+        usedforsecurity=False,
+    ).hexdigest()
+    stamp = int(match.created_at.timestamp() * 1000000)
+    return (
+        f'match-fragment:{name}:{match.pk}:{stamp}:'
+        f'{match.cache_version}:{vary}'
+    )
+
+
+async def aprefetch_fragment(name, match, vary_on=()):
+    """Look a fragment up before rendering, so a view can skip loading
+    data only the fragment needs.
+
+    Returns {key: content} for the template's prefetched_fragments (empty
+    on a miss). The {% matchcache %} tag renders a prefetched fragment as
+    is, so it can't be evicted between this check and rendering.
+    """
+    key = match_fragment_key(name, match, vary_on)
+    content = await fragment_cache().aget(key)
+    return {} if content is None else {key: content}
+
+
+def record(outcome):
+    """Count a fragment cache 'hit' or 'miss'"""
+    cache = fragment_cache()
+    key = STATS_KEYS[outcome]
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, 1, timeout=None)
+
+
+def fragment_stats():
+    """Hit/miss counters for the match fragment cache"""
+    cache = fragment_cache()
+    hits = cache.get(STATS_KEYS['hit'], 0)
+    misses = cache.get(STATS_KEYS['miss'], 0)
+    lookups = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 3) if lookups else None,
+    }
@@ -0,0 +1,214 @@
+"""
+Database-backed job queue for work too slow to do inside a request.
+
+Functions decorated with @task can be queued with enqueue(), which just
+inserts a Job row - in the caller's transaction, so a job queued by a
+request that rolls back is never run. The run_jobs management command
+is the worker: it claims due jobs and runs up to JOB_CONCURRENCY of them
+at once, each on its own thread and database connection.
+
+Claiming uses SELECT ... FOR UPDATE SKIP LOCKED where the database has
+it (PostgreSQL), so several workers never wait on or claim the same
+rows. SQLite has no row locks; there jobs are claimed by a single UPDATE
+of the first due rows, which takes the database write lock before it
+reads anything (a read followed by a write could deadlock with another
+worker thread) and tags the rows with a token unique to the claim.
+
+Tasks run outside any transaction, so one that talks to the network
+(SMTP, say) doesn't hold database locks while it waits; only the status
+changes are written atomically. A task may run more than once, so keep
+each one small and safe to repeat - fan a batch out into one job per
+item with enqueue_many() rather than looping inside a single job.
+
+A job that raises is retried after RETRY_DELAY seconds, doubling each
+time, until it has had max_attempts; then it is left failed with the
+traceback in last_error. Jobs still running after JOB_LOCK_TIMEOUT are
+assumed to have lost their worker and are queued again.
+"""
+import logging
+import os
+import socket
+import threading
+import traceback
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Registered tasks by name
+TASKS = {}
+
+# Seconds before the first retry; doubled for each one after
+RETRY_DELAY = 30
+
+
+def task(func):
+    """Register func so it can be queued by name"""
+    TASKS[func.__name__] = func
+    return func
+
+
+def _task_name(func):
+    name = func if isinstance(func, str) else func.__name__
+    if name not in TASKS:
+        raise ValueError(f'{name!r} is not a registered task.')
+    return name
+
+
+def enqueue(func, *args, **kwargs):
+    """Queue a registered task (or its name) to run in the background.
+
+    Arguments must be JSON serialisable - pass ids, not model instances.
+    """
+    return Job.objects.create(
+        name=_task_name(func), args=list(args), kwargs=kwargs)
+
+
+def enqueue_many(func, calls):
+    """Queue one job per args tuple in calls, with a single INSERT"""
+    name = _task_name(func)
+    return Job.objects.bulk_create(
+        [Job(name=name, args=list(args)) for args in calls])
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim_jobs(worker, limit=1):
+    """Mark up to limit due jobs as running for worker and return them"""
+    now = timezone.now()
+    due = Job.objects.filter(
+        status='queued', run_at__lte=now).order_by('run_at', 'pk')
+    claim = {'status': 'running', 'locked_by': worker, 'locked_at': now}
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            jobs = list(due.select_for_update(skip_locked=True)[:limit])
+            Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+                attempts=F('attempts') + 1, **claim)
+    else:
+        claim['locked_by'] = f'{worker}:{uuid.uuid4().hex[:8]}'
+        Job.objects.filter(pk__in=due.values('pk')[:limit]).update(
+            attempts=F('attempts') + 1, **claim)
+        return list(Job.objects.filter(
+            locked_by=claim['locked_by']).order_by('run_at', 'pk'))
+
+    for job in jobs:
+        job.attempts += 1
+        for field, value in claim.items():
+            setattr(job, field, value)
+    return jobs
+
+
+def run_job(job):
+    """Run a claimed job and record the outcome. Returns True on success.
+
+    The task itself runs outside a transaction; it opens its own where
+    its writes must go together.
+    """
+    func = TASKS.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f'{job.name!r} is not a registered task.')
+        func(*job.args, **job.kwargs)
+    except Exception:
+        logger.exception('Job %s (%s) failed', job.pk, job.name)
+        outcome = {'last_error': traceback.format_exc()}
+        if func is not None and job.attempts < job.max_attempts:
+            delay = RETRY_DELAY * 2 ** (job.attempts - 1)
+            outcome.update(
+                status='queued',
+                run_at=timezone.now() + timedelta(seconds=delay))
+        else:
+            outcome.update(status='failed', finished_at=timezone.now())
+    else:
+        outcome = {'status': 'done', 'finished_at': timezone.now()}
+
+    Job.objects.filter(pk=job.pk).update(
+        locked_by='', locked_at=None, **outcome)
+    for field, value in outcome.items():
+        setattr(job, field, value)
+    return job.status == 'done'
+
+
+def requeue_stale_jobs(timeout=None):
+    """Queue again (or fail) jobs whose worker stopped mid-run.
+
+    Returns the number of jobs released.
+    """
+    if timeout is None:
+        timeout = settings.JOB_LOCK_TIMEOUT
+    stale = Job.objects.filter(
+        status='running',
+        locked_at__lt=timezone.now() - timedelta(seconds=timeout))
+    release = {'locked_by': '', 'locked_at': None}
+    with transaction.atomic():
+        failed = stale.filter(attempts__gte=F('max_attempts')).update(
+            status='failed', finished_at=timezone.now(),
+            last_error='Worker stopped while running the job.', **release)
+        requeued = stale.update(status='queued', **release)
+    return failed + requeued
+
+
+def _run_in_thread(job):
+    """run_job on a pool thread, which has its own database connection"""
+    try:
+        return run_job(job)
+    finally:
+        close_old_connections()
+
+
+def run_worker(concurrency=None, burst=False, poll_interval=1.0,
+               stop=None):
+    """Claim and run jobs until stop is set (or, in burst mode, until
+    the queue has nothing due). Returns the number of jobs run.
+
+    With a concurrency of 1 jobs run on the calling thread.
+    """
+    if concurrency is None:
+        concurrency = settings.JOB_CONCURRENCY
+    if stop is None:
+        stop = threading.Event()
+    worker = worker_name()
+    requeue_stale_jobs()
+    finished = 0
+
+    if concurrency <= 1:
+        while not stop.is_set():
+            jobs = claim_jobs(worker)
+            if not jobs:
+                if burst:
+                    break
+                stop.wait(poll_interval)
+                continue
+            run_job(jobs[0])
+            finished += 1
+        return finished
+
+    running = set()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while not stop.is_set():
+            if len(running) < concurrency:
+                jobs = claim_jobs(worker, concurrency - len(running))
+                running.update(
+                    pool.submit(_run_in_thread, job) for job in jobs)
+            if not running:
+                if burst:
+                    break
+                stop.wait(poll_interval)
+                continue
+            done, running = wait(
+                running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            finished += len(done)
+        # Let jobs already claimed finish rather than leaving them locked
+        finished += len(wait(running).done)
+    return finished
@@ -0,0 +1,146 @@
+"""
+Live roster updates for the team selection page, as Server-Sent Events.
+
+MatchPlayer writes publish small deltas to an in-process broker once
+their transaction commits; each open roster_stream holds an asyncio queue
+subscribed to its match and forwards deltas to the browser as they
+arrive, so captains no longer reload the whole page to see responses.
+
+The broker lives in process memory, so streams only see writes made by
+the same server process. Serve the app with a single ASGI process (see
+mfm_p4/asgi.py). Under WSGI the stream answers 204, which tells
+EventSource not to reconnect, and the page works as before.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+
+from .models import Match
+
+# Slow clients are told to reload rather than buffering without limit
+QUEUE_SIZE = 100
+KEEPALIVE_SECONDS = 15
+# Streams end after this long; EventSource reconnects on its own
+MAX_STREAM_SECONDS = 300
+RESET = {'type': 'reset'}
+
+
+def _deliver(queue, event):
+    """Runs on the subscriber's event loop"""
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESET)
+
+
+class RosterBroker:
+    """Fan match events out to the queues subscribed to that match.
+
+    publish() may be called from any thread; delivery is handed to each
+    subscriber's own event loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, match_id):
+        """A new queue for match_id, bound to the running event loop"""
+        subscription = (
+            asyncio.get_running_loop(), asyncio.Queue(QUEUE_SIZE))
+        with self._lock:
+            self._subscribers[match_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, match_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(match_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[match_id]
+
+    def subscriber_count(self, match_id):
+        with self._lock:
+            return len(self._subscribers.get(match_id, ()))
+
+    def publish(self, match_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(match_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_deliver, queue, event)
+            except RuntimeError:
+                # The subscriber's loop has closed; it will unsubscribe
+                pass
+
+
+broker = RosterBroker()
+
+
+def publish_roster_changes(match_id, players):
+    """Send player deltas for one match once the transaction commits.
+
+    players are dicts with 'id' and whichever of 'availability' and
+    'selected' changed.
+    """
+    event = {'type': 'roster', 'match': match_id, 'players': players}
+    transaction.on_commit(lambda: broker.publish(match_id, event))
+
+
+def format_event(event):
+    """One SSE message: 'event: <type>' plus the JSON payload"""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def roster_events(match_id):
+    """Yield SSE messages for a match until MAX_STREAM_SECONDS pass"""
+    subscription = broker.subscribe(match_id)
+    queue = subscription[1]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + MAX_STREAM_SECONDS
+    try:
+        # Reconnect quickly if the stream drops
+        yield 'retry: 3000\n\n'
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), min(KEEPALIVE_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                # Comment lines keep proxies from closing idle streams
+                yield ': keepalive\n\n'
+                continue
+            yield format_event(event)
+    finally:
+        broker.unsubscribe(match_id, subscription)
+
+
+async def roster_stream(request, match_pk):
+    """Stream roster deltas for a match to members of its club"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    is_member = await Match.objects.filter(
+        pk=match_pk, club__players__user=user).aexists()
+    if not is_member:
+        raise Http404
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be tied up for the life of the stream
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(
+        roster_events(match_pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx-style proxies buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,74 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models.functions import Lower
+
+from clubs.models import Match, MatchPlayer, Player
+from clubs.services import roster_queryset
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Show query plans and timings for the hot lookups '
+        '(run against seeded data on SQLite or PostgreSQL)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--match', type=int,
+            help='Match id to use (default: the latest match)')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Times to run each query for the timing (default 5)')
+
+    def handle(self, *args, **options):
+        if options['match']:
+            match = Match.objects.filter(pk=options['match']).first()
+        else:
+            match = Match.objects.order_by('-pk').first()
+        if match is None:
+            raise CommandError('No matches found - seed some data first.')
+
+        player = Player.objects.filter(
+            club_id=match.club_id).exclude(email='').first()
+        if player is None:
+            raise CommandError('The match club has no players with email.')
+
+        queries = [
+            ('Team selection roster', roster_queryset(match)),
+            ('Match list with player status',
+             Match.objects.filter(club_id=match.club_id)
+             .with_player_status(player).in_display_order()),
+            ('Match availability bucket',
+             MatchPlayer.objects.filter(
+                 match=match, availability='yes', selected=False)),
+            ('Membership lookup',
+             Player.objects.filter(user_id=player.user_id)
+             .select_related('club')),
+            ('Email linking',
+             Player.objects.filter(email_lower=player.email.lower(),
+                                   user__isnull=True)),
+            ('User email lookup',
+             User.objects.alias(email_lower=Lower('email'))
+             .filter(email_lower=player.email.lower())),
+        ]
+
+        self.stdout.write(
+            f'{connection.vendor} - match {match.pk}, '
+            f'{Match.objects.count()} matches, '
+            f'{MatchPlayer.objects.count()} match players\n')
+        for label, queryset in queries:
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{label}: {statistics.median(timings):.2f} ms median'))
+            self.stdout.write(queryset.explain())
+            self.stdout.write('')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clubs.models import Club
+from clubs.services import import_players, parse_player_csv
+
+
+class Command(BaseCommand):
+    help = (
+        'Import players into a club from a CSV file with name, email, '
+        'phone and role columns'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('club', type=int, help='Club id')
+        parser.add_argument('path', help='CSV file to import')
+
+    def handle(self, *args, **options):
+        try:
+            club = Club.objects.get(pk=options['club'])
+        except Club.DoesNotExist:
+            raise CommandError(f"No club with id {options['club']}.")
+        try:
+            with open(options['path'], encoding='utf-8-sig',
+                      newline='') as csv_file:
+                rows = parse_player_csv(csv_file)
+        except (OSError, UnicodeDecodeError, ValueError) as error:
+            raise CommandError(str(error))
+
+        created, errors = import_players(club, rows)
+        for row, message in errors:
+            self.stderr.write(f'Row {row}: {message}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created} of {len(rows)} players into {club.name}.'))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from clubs.models import Player
+from clubs.services import link_players_by_email
+
+
+class Command(BaseCommand):
+    help = 'Link every unlinked player to the user with the same email'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Player ids covered by each UPDATE')
+
+    def handle(self, *args, **options):
+        bounds = Player.objects.filter(
+            user__isnull=True
+        ).exclude(email='').aggregate(first=Min('pk'), last=Max('pk'))
+
+        linked = 0
+        if bounds['first'] is not None:
+            # Short transactions, so signups aren't blocked for long
+            for start in range(
+                    bounds['first'], bounds['last'] + 1,
+                    options['batch_size']):
+                with transaction.atomic():
+                    linked += link_players_by_email(
+                        pk_range=(start, start + options['batch_size'] - 1))
+
+        self.stdout.write(self.style.SUCCESS(f'Linked {linked} players.'))
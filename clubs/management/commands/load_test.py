@@ -0,0 +1,165 @@
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY,
+)
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from clubs.models import Match, Player
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """Surface redirects (e.g. to the login page) instead of following"""
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+opener = urllib.request.build_opener(NoRedirect)
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test running servers (e.g. the WSGI and ASGI modes side by '
+        'side) and compare throughput and latency on the read-heavy pages'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target', action='append', required=True,
+            help='name=base_url, e.g. wsgi=http://127.0.0.1:8000 '
+                 '(repeat to compare servers)')
+        parser.add_argument(
+            '--username', required=True,
+            help='User to browse as - must be a member of a club, e.g. '
+                 'a seed_load user')
+        parser.add_argument(
+            '--path', action='append',
+            help='Paths to request (default: match list, player list and '
+                 "the user's first match)")
+        parser.add_argument('--requests', type=int, default=500,
+                            help='Requests per target')
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--json', help='Also write the report here')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 2:
+            raise CommandError('At least two requests are needed.')
+        targets = []
+        for target in options['target']:
+            name, sep, url = target.partition('=')
+            if not sep or not url.startswith('http'):
+                raise CommandError(f'Expected name=url, got {target!r}')
+            targets.append((name, url.rstrip('/')))
+
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['username']!r}")
+        paths = options['path'] or self.default_paths(user)
+        # Servers share the database, so one session works for all
+        cookie = f'{settings.SESSION_COOKIE_NAME}={self.login(user)}'
+        self.timeout = options['timeout']
+
+        report = {}
+        for name, base_url in targets:
+            urls = [base_url + path for path in paths]
+            # Warm up each path once so start-up cost isn't measured
+            for url in urls:
+                self.fetch(url, cookie)
+            report[name] = self.run(
+                urls, cookie, options['requests'], options['concurrency'])
+
+        self.print_report(report, options)
+        if options['json']:
+            with open(options['json'], 'w') as report_file:
+                json.dump({
+                    'paths': paths,
+                    'concurrency': options['concurrency'],
+                    'targets': report,
+                }, report_file, indent=2)
+
+    def default_paths(self, user):
+        player = Player.objects.filter(user=user).first()
+        if player is None:
+            raise CommandError('The user is not a member of any club.')
+        paths = [reverse('match_list'), reverse('player_list')]
+        match = Match.objects.filter(club_id=player.club_id).first()
+        if match:
+            paths.append(reverse('match_detail', args=[match.pk]))
+        return paths
+
+    def login(self, user):
+        """Create a session for user directly, as Client.force_login does"""
+        engine = import_module(settings.SESSION_ENGINE)
+        session = engine.SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session.session_key
+
+    def fetch(self, url, cookie):
+        """(status, seconds) for one GET; status 0 on a network error"""
+        request = urllib.request.Request(url, headers={'Cookie': cookie})
+        start = time.perf_counter()
+        try:
+            with opener.open(request, timeout=self.timeout) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            status = error.code
+        except (urllib.error.URLError, OSError):
+            status = 0
+        return status, time.perf_counter() - start
+
+    def run(self, urls, cookie, count, concurrency):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(
+                lambda n: self.fetch(urls[n % len(urls)], cookie),
+                range(count)))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(seconds * 1000 for _, seconds in results)
+        # Redirects mean the session wasn't accepted - count as errors
+        errors = sum(1 for status, _ in results if not 200 <= status < 300)
+        cuts = statistics.quantiles(latencies, n=100)
+        return {
+            'requests': count,
+            'errors': errors,
+            'seconds': round(elapsed, 3),
+            'requests_per_second': round(count / elapsed, 1),
+            'p50_ms': round(cuts[49], 1),
+            'p95_ms': round(cuts[94], 1),
+            'p99_ms': round(cuts[98], 1),
+        }
+
+    def print_report(self, report, options):
+        self.stdout.write(
+            f"{options['requests']} requests per target, "
+            f"concurrency {options['concurrency']}")
+        self.stdout.write(
+            f"{'target':<12}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+            f"{'p99 ms':>10}{'errors':>8}")
+        for name, result in report.items():
+            self.stdout.write(
+                f"{name:<12}{result['requests_per_second']:>10}"
+                f"{result['p50_ms']:>10}{result['p95_ms']:>10}"
+                f"{result['p99_ms']:>10}{result['errors']:>8}")
+        if len(report) > 1:
+            (base, first), *others = report.items()
+            for name, result in others:
+                ratio = (result['requests_per_second']
+                         / first['requests_per_second'])
+                self.stdout.write(f'{name} vs {base}: {ratio:.2f}x throughput')
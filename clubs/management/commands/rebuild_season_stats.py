@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from clubs.jobs import enqueue
+from clubs.stats import rebuild_season_stats
+from clubs.tasks import rebuild_club_season_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-player season statistics from match history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--club', type=int, help='Only rebuild stats for this club id')
+        parser.add_argument(
+            '--background', action='store_true',
+            help='Queue the rebuild for the run_jobs worker (needs --club)')
+
+    def handle(self, *args, **options):
+        if options['background']:
+            if not options['club']:
+                raise CommandError('--background needs --club.')
+            job = enqueue(rebuild_club_season_stats, options['club'])
+            self.stdout.write(self.style.SUCCESS(f'Queued job {job.pk}.'))
+            return
+        seasons = rebuild_season_stats(options['club'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {seasons} club seasons.'))
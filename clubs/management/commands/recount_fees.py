@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from clubs.models import Player, fee_balance_expression
+
+
+class Command(BaseCommand):
+    help = 'Recompute player fee balances from the ledger and repair drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--club', type=int, help='Only recount players for this club id')
+
+    def handle(self, *args, **options):
+        players = Player.objects.all()
+        if options['club']:
+            players = players.filter(club_id=options['club'])
+
+        stale = players.annotate(
+            true_balance=fee_balance_expression()
+        ).exclude(fee_balance=F('true_balance'))
+
+        with transaction.atomic():
+            repaired = Player.objects.filter(
+                pk__in=stale.values('pk')).refresh_balances()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Repaired {repaired} of {players.count()} players.'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from clubs.models import Match, roster_count_expressions
+
+
+class Command(BaseCommand):
+    help = 'Recompute match roster counters and repair any that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--club', type=int, help='Only recount matches for this club id')
+
+    def handle(self, *args, **options):
+        matches = Match.objects.all()
+        if options['club']:
+            matches = matches.filter(club_id=options['club'])
+
+        # Compare each stored counter with its recomputed value
+        true_counts = {
+            f'true_{field}': expression
+            for field, expression in roster_count_expressions().items()
+        }
+        drifted = Q()
+        for field in Match.COUNTER_FIELDS:
+            drifted |= ~Q(**{field: F(f'true_{field}')})
+        stale = matches.annotate(**true_counts).filter(drifted)
+
+        with transaction.atomic():
+            repaired = Match.objects.filter(
+                pk__in=stale.values('pk')).refresh_counts()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Repaired {repaired} of {matches.count()} matches.'))
@@ -0,0 +1,41 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from clubs.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.JOB_CONCURRENCY,
+            help='Jobs run at once (default JOB_CONCURRENCY)')
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait when no job is due')
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='Exit once no job is due instead of waiting for more')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        # Finish the jobs in hand on SIGTERM (e.g. a dyno restart)
+        previous = {
+            signum: signal.signal(signum, lambda *_: stop.set())
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            finished = run_worker(
+                concurrency=options['concurrency'],
+                burst=options['burst'],
+                poll_interval=options['poll_interval'],
+                stop=stop,
+            )
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+        self.stdout.write(self.style.SUCCESS(f'Ran {finished} jobs.'))
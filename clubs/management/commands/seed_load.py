@@ -0,0 +1,179 @@
+import random
+from datetime import date, time, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from clubs.models import Club, Player, Opposition, Match, MatchPlayer
+from clubs.stats import refresh_season_stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic users, clubs, players, oppositions, matches '
+        'and availability for load testing (deterministic by --seed)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--clubs', type=int, default=10)
+        parser.add_argument('--players', type=int, default=25,
+                            help='Players per club')
+        parser.add_argument('--oppositions', type=int, default=8,
+                            help='Oppositions per club')
+        parser.add_argument('--matches', type=int, default=20,
+                            help='Matches per club')
+        parser.add_argument('--response-rate', type=float, default=0.8,
+                            help='Share of players answering each match')
+        parser.add_argument('--season', type=int, default=2026)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per INSERT statement')
+        parser.add_argument('--club-batch', type=int, default=50,
+                            help='Clubs generated per transaction')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('At least one user is needed to own clubs.')
+        if options['matches'] and options['oppositions'] < 1:
+            raise CommandError('Matches need at least one opposition.')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.options = options
+
+        user_ids = self.create_users(options['users'])
+        totals = {'clubs': 0, 'players': 0, 'matches': 0, 'responses': 0}
+
+        # Clubs are generated a chunk at a time so memory stays bounded
+        for first in range(0, options['clubs'], options['club_batch']):
+            count = min(options['club_batch'], options['clubs'] - first)
+            with transaction.atomic():
+                created = self.create_clubs(first, count, user_ids)
+            for key, value in created.items():
+                totals[key] += value
+            self.stdout.write(
+                f"{first + count}/{options['clubs']} clubs, "
+                f"{totals['responses']} match players")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(user_ids)} users, {totals['clubs']} clubs, "
+            f"{totals['players']} players, {totals['matches']} matches, "
+            f"{totals['responses']} match players."))
+
+    def create_users(self, count):
+        """Create load-test users sharing one pre-hashed password"""
+        password = make_password('loadtest-password')
+        offset = User.objects.count()
+        user_ids = []
+        for first in range(0, count, self.batch_size):
+            users = [
+                User(username=f'load{offset + n}',
+                     email=f'load{offset + n}@example.com',
+                     password=password)
+                for n in range(first, min(first + self.batch_size, count))
+            ]
+            User.objects.bulk_create(users)
+            user_ids.extend(user.pk for user in users)
+        return user_ids
+
+    def create_clubs(self, first, count, user_ids):
+        """Create one chunk of clubs with their squads and fixtures"""
+        rng = self.rng
+        options = self.options
+
+        clubs = Club.objects.bulk_create([
+            Club(name=f'Load CC {first + n}',
+                 home_ground=f'Ground {first + n}',
+                 created_by_id=user_ids[(first + n) % len(user_ids)])
+            for n in range(count)
+        ], batch_size=self.batch_size)
+
+        players = []
+        oppositions = []
+        for club in clubs:
+            for n in range(options['players']):
+                # Spread users over the first players of each club
+                linked = n < 3 or rng.random() < 0.3
+                user_id = rng.choice(user_ids) if linked else None
+                players.append(Player(
+                    club=club,
+                    user_id=user_id,
+                    name=f'Player {n:03d}',
+                    email=f'p{club.pk}-{n}@example.com',
+                    role=['admin', 'captain'][n] if n < 2 else 'player',
+                    is_active=rng.random() > 0.05,
+                ))
+            for n in range(options['oppositions']):
+                oppositions.append(Opposition(
+                    club=club, name=f'Opposition {n}',
+                    home_ground=f'Away Ground {n}'))
+        Player.objects.bulk_create(players, batch_size=self.batch_size)
+        Opposition.objects.bulk_create(
+            oppositions, batch_size=self.batch_size)
+
+        season_start = date(options['season'], 4, 25)
+        matches = []
+        for index, club in enumerate(clubs):
+            club_oppositions = oppositions[
+                index * options['oppositions']:
+                (index + 1) * options['oppositions']]
+            for n in range(options['matches']):
+                opposition = rng.choice(club_oppositions)
+                is_home = n % 2 == 0
+                matches.append(Match(
+                    club=club,
+                    opposition=opposition,
+                    date=season_start + timedelta(weeks=n),
+                    time=time(13, 0),
+                    venue=(club.home_ground if is_home
+                           else opposition.home_ground),
+                    is_home=is_home,
+                    match_fee=club.default_match_fee,
+                    status=rng.choices(
+                        ['scheduled', 'completed', 'cancelled'],
+                        [6, 3, 1])[0],
+                ))
+        Match.objects.bulk_create(matches, batch_size=self.batch_size)
+
+        # Availability rows are written as they are generated
+        responses = 0
+        pending = []
+        for index, match in enumerate(matches):
+            club_index = index // max(options['matches'], 1)
+            squad = players[
+                club_index * options['players']:
+                (club_index + 1) * options['players']]
+            picked = 0
+            for player in squad:
+                if rng.random() >= options['response_rate']:
+                    continue
+                availability = rng.choices(
+                    ['yes', 'maybe', 'no'], [6, 2, 2])[0]
+                selected = availability == 'yes' and picked < 11
+                picked += selected
+                pending.append(MatchPlayer(
+                    match=match, player=player,
+                    availability=availability, selected=selected))
+                if len(pending) >= self.batch_size:
+                    MatchPlayer.objects.bulk_create(pending)
+                    responses += len(pending)
+                    pending = []
+        if pending:
+            MatchPlayer.objects.bulk_create(pending)
+            responses += len(pending)
+
+        # bulk_create skips signals, so fill the counters in one UPDATE
+        Match.objects.filter(club__in=clubs).refresh_counts()
+        # ...and the season stats a club season at a time
+        for club_id, season in {
+                (match.club_id, match.date.year) for match in matches}:
+            refresh_season_stats(club_id, season)
+
+        return {
+            'clubs': len(clubs),
+            'players': len(players),
+            'matches': len(matches),
+            'responses': responses,
+        }
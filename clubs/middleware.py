@@ -0,0 +1,114 @@
+from functools import partial
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.utils.functional import SimpleLazyObject
+
+from .models import Player
+
+# Session key holding the club a multi-club user is working in
+ACTIVE_CLUB_SESSION_KEY = 'active_club_id'
+
+
+class Membership:
+    """The current user's Player rows (with club and role), loaded once.
+
+    Views, templates and the player context processor consult this
+    instead of re-querying Player for the same user on every call.
+    active_club_id (from the session) picks which club's player the
+    pages are for; it falls back to the first club.
+    """
+
+    def __init__(self, user, players=None, active_club_id=None):
+        self.user_id = user.pk
+        if players is None:
+            players = []
+            if user.is_authenticated:
+                players = list(self.queryset(user))
+        self.players = players
+        self.by_club = {}
+        for player in self.players:
+            # Keep the first (by name) player if linked twice in a club
+            self.by_club.setdefault(player.club_id, player)
+        if active_club_id not in self.by_club:
+            active_club_id = self.players[0].club_id if self.players else None
+        self.active_club_id = active_club_id
+
+    @staticmethod
+    def queryset(user):
+        return Player.objects.filter(user=user).select_related('club')
+
+    @classmethod
+    async def aload(cls, user, active_club_id=None):
+        """Build a Membership with the async ORM"""
+        players = []
+        if user.is_authenticated:
+            players = [player async for player in cls.queryset(user)]
+        return cls(user, players, active_club_id)
+
+    def __bool__(self):
+        return bool(self.players)
+
+    @property
+    def player(self):
+        """The user's player in the active club (None if not in a club)"""
+        return self.by_club.get(self.active_club_id)
+
+    @property
+    def club(self):
+        """The active club (None if not in a club)"""
+        player = self.player
+        return player.club if player else None
+
+    @property
+    def clubs(self):
+        return [player.club for player in self.by_club.values()]
+
+    def player_for(self, club_id):
+        """The user's player in the given club, or None"""
+        return self.by_club.get(club_id)
+
+    def is_admin_or_captain(self, club_id):
+        """Check if user is admin or captain of the given club"""
+        return any(
+            player.club_id == club_id and player.role in ('admin', 'captain')
+            for player in self.players
+        )
+
+
+async def aget_membership(request):
+    """Async counterpart of request.membership, like request.auser().
+
+    Also swaps request.user and request.membership for the loaded objects,
+    so templates and sync helpers can read them without touching the
+    database from the event loop.
+    """
+    if not hasattr(request, '_amembership'):
+        request.user = await request.auser()
+        request._amembership = await Membership.aload(
+            request.user,
+            await request.session.aget(ACTIVE_CLUB_SESSION_KEY))
+        request.membership = request._amembership
+    return request._amembership
+
+
+class MembershipMiddleware:
+    """Attach a lazily loaded Membership to every request.
+
+    Must come after SessionMiddleware and AuthenticationMiddleware.
+    Nothing is queried until a view or template first touches
+    request.membership (or awaits request.amembership() in an async view).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.membership = SimpleLazyObject(lambda: Membership(
+            request.user,
+            active_club_id=request.session.get(ACTIVE_CLUB_SESSION_KEY)))
+        request.amembership = partial(aget_membership, request)
+        return self.get_response(request)
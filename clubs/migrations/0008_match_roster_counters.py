@@ -0,0 +1,61 @@
+# Generated by Django 6.0.1 on 2026-10-16 21:00
+
+from django.db import migrations, models
+
+
+def backfill_counts(apps, schema_editor):
+    """Fill the new counter columns for existing matches"""
+    Match = apps.get_model('clubs', 'Match')
+    MatchPlayer = apps.get_model('clubs', 'MatchPlayer')
+    Player = apps.get_model('clubs', 'Player')
+
+    for match in Match.objects.all():
+        rows = MatchPlayer.objects.filter(match=match)
+        unselected = rows.filter(selected=False)
+        Match.objects.filter(pk=match.pk).update(
+            selected_count=rows.filter(selected=True).count(),
+            available_count=unselected.filter(availability='yes').count(),
+            maybe_count=unselected.filter(availability='maybe').count(),
+            unavailable_count=unselected.filter(availability='no').count(),
+            awaiting_count=Player.objects.filter(
+                club_id=match.club_id, is_active=True
+            ).exclude(
+                pk__in=rows.values('player_id')
+            ).count(),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0007_alter_opposition_options_alter_player_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='available_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='awaiting_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='maybe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='selected_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='unavailable_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-16 21:03
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0008_match_roster_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='match',
+            index=models.Index(fields=['club', 'status', 'date'], name='match_club_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='matchplayer',
+            index=models.Index(fields=['match', 'availability', 'selected'], name='matchplayer_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['club', 'name'], name='player_active_roster_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='player_email_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-16 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0009_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='cache_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
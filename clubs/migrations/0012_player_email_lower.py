@@ -0,0 +1,39 @@
+# Generated by Django 6.0.1 on 2026-10-16 22:21
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+def add_user_email_index(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        f'CREATE INDEX auth_user_email_lower_idx '
+        f'ON {quote(User._meta.db_table)} (LOWER({quote("email")}))')
+
+
+def remove_user_email_index(apps, schema_editor):
+    schema_editor.execute('DROP INDEX auth_user_email_lower_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0011_match_updated_at_matchplayer_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='player',
+            name='player_email_lower_idx',
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='email_lower',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.functions.text.Lower('email'), output_field=models.CharField(max_length=254)),
+        ),
+        # The user side of email linking (the user table isn't ours to alter)
+        migrations.RunPython(add_user_email_index, remove_user_email_index),
+    ]
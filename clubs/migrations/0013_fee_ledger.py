@@ -0,0 +1,103 @@
+# Generated by Django 6.0.1 on 2026-10-16 22:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+
+
+def charge_completed_matches(apps, schema_editor):
+    """Charge the teams of matches completed before the ledger existed,
+    so balances are right from the start rather than when each old match
+    is next saved"""
+    Match = apps.get_model('clubs', 'Match')
+    MatchPlayer = apps.get_model('clubs', 'MatchPlayer')
+    FeeCharge = apps.get_model('clubs', 'FeeCharge')
+    Player = apps.get_model('clubs', 'Player')
+
+    for match in Match.objects.filter(
+            status='completed').select_related('club').iterator():
+        fee = match.match_fee
+        if fee is None:
+            fee = match.club.default_match_fee
+        if not fee:
+            continue
+        FeeCharge.objects.bulk_create([
+            FeeCharge(match_id=match.pk, player_id=player_id, amount=fee)
+            for player_id in MatchPlayer.objects.filter(
+                match=match, selected=True).values_list('player_id', flat=True)
+        ], ignore_conflicts=True)
+
+    # No payments exist yet, so each balance is the sum of its charges
+    charged = FeeCharge.objects.filter(
+        player=OuterRef('pk')).order_by().values('player').annotate(
+        total=Sum('amount')).values('total')
+    Player.objects.filter(
+        pk__in=FeeCharge.objects.values('player')
+    ).update(fee_balance=Subquery(charged))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0012_player_email_lower'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeeCharge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FeePayment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=7)),
+                ('note', models.CharField(blank=True, max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='player',
+            name='fee_balance',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=8),
+        ),
+        migrations.AddIndex(
+            model_name='player',
+            index=models.Index(condition=models.Q(('fee_balance__gt', 0)), fields=['club', '-fee_balance'], name='player_fees_owed_idx'),
+        ),
+        migrations.AddField(
+            model_name='feecharge',
+            name='match',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fee_charges', to='clubs.match'),
+        ),
+        migrations.AddField(
+            model_name='feecharge',
+            name='player',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fee_charges', to='clubs.player'),
+        ),
+        migrations.AddField(
+            model_name='feepayment',
+            name='player',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fee_payments', to='clubs.player'),
+        ),
+        migrations.AddField(
+            model_name='feepayment',
+            name='recorded_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='fee_payments_recorded', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='feecharge',
+            unique_together={('match', 'player')},
+        ),
+        migrations.RunPython(
+            charge_completed_matches, migrations.RunPython.noop),
+    ]
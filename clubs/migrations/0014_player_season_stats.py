@@ -0,0 +1,77 @@
+# Generated by Django 6.0.1 on 2026-10-16 22:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_stats(apps, schema_editor):
+    """Fill the stats table for existing club seasons, as
+    rebuild_season_stats would"""
+    Match = apps.get_model('clubs', 'Match')
+    MatchPlayer = apps.get_model('clubs', 'MatchPlayer')
+    FeeCharge = apps.get_model('clubs', 'FeeCharge')
+    Player = apps.get_model('clubs', 'Player')
+    PlayerSeasonStats = apps.get_model('clubs', 'PlayerSeasonStats')
+
+    seasons = set(Match.objects.values_list('club_id', 'date__year'))
+    for club_id, season in sorted(seasons):
+        matches = Match.objects.filter(
+            club_id=club_id, date__year=season).exclude(status='cancelled')
+        counts = {
+            row.pop('player_id'): row
+            for row in MatchPlayer.objects.filter(
+                match__in=matches
+            ).values('player_id').annotate(
+                responses=Count('pk'),
+                available=Count('pk', filter=Q(availability='yes')),
+                selections=Count('pk', filter=Q(selected=True)),
+                appearances=Count(
+                    'pk', filter=Q(selected=True, match__status='completed')),
+            ).order_by()
+        }
+        fees = dict(FeeCharge.objects.filter(
+            match__in=matches
+        ).values('player_id').annotate(
+            total=Sum('amount')
+        ).order_by().values_list('player_id', 'total'))
+        total = matches.count()
+        PlayerSeasonStats.objects.bulk_create([
+            PlayerSeasonStats(
+                player_id=player_id, club_id=club_id, season=season,
+                matches=total, fees_charged=fees.get(player_id, 0),
+                **counts.get(player_id, {}))
+            for player_id in Player.objects.filter(
+                club_id=club_id).values_list('pk', flat=True)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clubs', '0013_fee_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerSeasonStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('season', models.PositiveSmallIntegerField()),
+                ('matches', models.PositiveIntegerField(default=0)),
+                ('responses', models.PositiveIntegerField(default=0)),
+                ('available', models.PositiveIntegerField(default=0)),
+                ('selections', models.PositiveIntegerField(default=0)),
+                ('appearances', models.PositiveIntegerField(default=0)),
+                ('fees_charged', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('club', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='season_stats', to='clubs.club')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='season_stats', to='clubs.player')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['club', 'season'], name='season_stats_club_idx')],
+                'unique_together': {('player', 'season')},
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,13 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import (
+    BooleanField, Case, Count, Exists, F, IntegerField, OuterRef, Q,
+    Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce, Lower
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 
 class Club(models.Model):
@@ -21,6 +29,44 @@ class Club(models.Model):
         ).exists()
 
 
+class ClubQuerySet(models.QuerySet):
+    """Queries for models that belong to a club"""
+
+    def for_club(self, club_id):
+        """Only rows belonging to this club"""
+        return self.filter(club_id=club_id)
+
+
+class PlayerQuerySet(ClubQuerySet):
+    """Reusable player queries"""
+
+    def active(self):
+        return self.filter(is_active=True)
+
+    def refresh_balances(self):
+        """Recompute fee_balance from the fee ledger in a single UPDATE"""
+        return self.update(fee_balance=fee_balance_expression())
+
+
+def _sum_subquery(queryset, group_by, field):
+    """Wrap a filtered queryset as a SUM(field) subquery (0 if no rows)"""
+    summed = queryset.order_by().values(group_by).annotate(
+        total=Sum(field)).values('total')
+    output_field = models.DecimalField(max_digits=8, decimal_places=2)
+    return Coalesce(
+        Subquery(summed, output_field=output_field),
+        Value(Decimal('0')), output_field=output_field)
+
+
+def fee_balance_expression():
+    """Expression giving the true value of Player.fee_balance"""
+    charged = _sum_subquery(
+        FeeCharge.objects.filter(player=OuterRef('pk')), 'player', 'amount')
+    paid = _sum_subquery(
+        FeePayment.objects.filter(player=OuterRef('pk')), 'player', 'amount')
+    return charged - paid
+
+
 class Player(models.Model):
     """A player/member belonging to a club"""
 
@@ -39,18 +85,55 @@ class Player(models.Model):
     )
     name = models.CharField(max_length=100)
     email = models.EmailField(blank=True)
+    # Lower-cased email, kept by the database, for linking to users
+    email_lower = models.GeneratedField(
+        expression=Lower('email'),
+        output_field=models.CharField(max_length=254),
+        db_persist=True,
+        db_index=True,
+    )
     phone = models.CharField(max_length=20, blank=True)
     role = models.CharField(
         max_length=10, choices=ROLE_CHOICES, default='player')
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Fees charged less payments made - kept in step with the ledger by
+    # clubs.fees (repair with recount_fees)
+    fee_balance = models.DecimalField(
+        max_digits=8, decimal_places=2, default=0, editable=False)
+
+    objects = PlayerQuerySet.as_manager()
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            # Club roster: active players by name
+            models.Index(
+                fields=['club', 'name'],
+                condition=Q(is_active=True),
+                name='player_active_roster_idx',
+            ),
+            # Outstanding fees dashboard: players owing, largest first
+            models.Index(
+                fields=['club', '-fee_balance'],
+                condition=Q(fee_balance__gt=0),
+                name='player_fees_owed_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.club.name})"
 
+    def save(self, *args, **kwargs):
+        """Save without writing back a (possibly stale) fee balance"""
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and not field.generated
+                and field.name != 'fee_balance'
+            ]
+        super().save(*args, **kwargs)
+
 
 class Opposition(models.Model):
     """Opposition teams that the club plays against"""
@@ -61,6 +144,8 @@ class Opposition(models.Model):
     name = models.CharField(max_length=100)
     home_ground = models.CharField(max_length=100, blank=True)
 
+    objects = ClubQuerySet.as_manager()
+
     class Meta:
         ordering = ['name']
 
@@ -68,6 +153,89 @@ class Opposition(models.Model):
         return self.name
 
 
+class MatchQuerySet(ClubQuerySet):
+    """Reusable match listing queries"""
+
+    def in_display_order(self):
+        """Scheduled first, then completed, then cancelled - by date"""
+        return self.annotate(
+            status_order=Case(
+                When(status='scheduled', then=Value(0)),
+                When(status='completed', then=Value(1)),
+                When(status='cancelled', then=Value(2)),
+                output_field=IntegerField(),
+            )
+        ).order_by('status_order', 'date')
+
+    def with_player_status(self, player):
+        """Annotate a player's availability and selection for each match.
+
+        Comes back in the same SQL statement as the matches; team counts
+        are read from the counter columns on the match row.
+        """
+        player_row = MatchPlayer.objects.filter(
+            match=OuterRef('pk'), player=player)
+        return self.annotate(
+            my_availability=Subquery(
+                player_row.values('availability')[:1]),
+            is_selected=Coalesce(
+                Subquery(player_row.values('selected')[:1]),
+                Value(False),
+                output_field=BooleanField(),
+            ),
+        )
+
+    def refresh_counts(self):
+        """Recompute the roster counter columns from MatchPlayer rows.
+
+        A single UPDATE, so it can run inside the same transaction as the
+        change that made the counters stale. Also bumps cache_version.
+        """
+        return self.update(
+            cache_version=F('cache_version') + 1,
+            updated_at=timezone.now(),
+            **roster_count_expressions())
+
+    def bump_cache_version(self):
+        """Invalidate cached fragments (and ETags) for these matches"""
+        return self.update(
+            cache_version=F('cache_version') + 1,
+            updated_at=timezone.now())
+
+
+def _count_subquery(queryset, group_by):
+    """Wrap a filtered queryset as a COUNT(*) subquery (0 if no rows)"""
+    counted = queryset.order_by().values(group_by).annotate(
+        total=Count('pk')).values('total')
+    return Coalesce(
+        Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def roster_count_expressions():
+    """Expressions giving the true value of each Match counter column"""
+    def match_players(**filters):
+        return _count_subquery(
+            MatchPlayer.objects.filter(match=OuterRef('pk'), **filters),
+            'match')
+
+    responded = MatchPlayer.objects.filter(
+        match=OuterRef(OuterRef('pk')), player=OuterRef('pk'))
+    awaiting = Player.objects.filter(
+        club=OuterRef('club'), is_active=True
+    ).exclude(Exists(responded))
+
+    return {
+        'selected_count': match_players(selected=True),
+        'available_count': match_players(
+            availability='yes', selected=False),
+        'maybe_count': match_players(
+            availability='maybe', selected=False),
+        'unavailable_count': match_players(
+            availability='no', selected=False),
+        'awaiting_count': _count_subquery(awaiting, 'club'),
+    }
+
+
 class Match(models.Model):
     """A scheduled cricket match"""
 
@@ -94,31 +262,49 @@ class Match(models.Model):
         max_length=10, choices=STATUS_CHOICES, default='scheduled'
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also moved on by roster changes, so it dates everything on the card
+    updated_at = models.DateTimeField(auto_now=True)
 
-    def __str__(self):
-        return f"{self.club.name} vs {self.opposition.name} - {self.date}"
+    # Cached roster counts, one per team selection bucket - kept in step
+    # with MatchPlayer by clubs.signals (repair with recount_matches)
+    selected_count = models.PositiveIntegerField(default=0, editable=False)
+    available_count = models.PositiveIntegerField(default=0, editable=False)
+    maybe_count = models.PositiveIntegerField(default=0, editable=False)
+    unavailable_count = models.PositiveIntegerField(
+        default=0, editable=False)
+    awaiting_count = models.PositiveIntegerField(default=0, editable=False)
+    # Bumped whenever the match or its roster changes (fragment cache key)
+    cache_version = models.PositiveIntegerField(default=0, editable=False)
 
-    def selected_count(self):
-        """Count players who are selected"""
-        return self.match_players.filter(selected=True).count()
+    COUNTER_FIELDS = [
+        'selected_count', 'available_count', 'maybe_count',
+        'unavailable_count', 'awaiting_count',
+    ]
 
-    def available_count(self):
-        """Count players who are available"""
-        return self.match_players.filter(availability='yes').count()
+    objects = MatchQuerySet.as_manager()
 
-    def maybe_count(self):
-        """Count players who are maybe"""
-        return self.match_players.filter(availability='maybe').count()
+    class Meta:
+        indexes = [
+            # Club fixture lists, grouped by status and ordered by date
+            models.Index(
+                fields=['club', 'status', 'date'],
+                name='match_club_status_date_idx',
+            ),
+        ]
 
-    def unavailable_count(self):
-        """Count players who are not available"""
-        return self.match_players.filter(availability='no').count()
+    def __str__(self):
+        return f"{self.club.name} vs {self.opposition.name} - {self.date}"
 
-    def awaiting_count(self):
-        """Count players with no response yet"""
-        total_players = self.club.players.filter(is_active=True).count()
-        responded = self.match_players.count()
-        return total_players - responded
+    def save(self, *args, **kwargs):
+        """Save without writing back (possibly stale) counters/version"""
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.COUNTER_FIELDS
+                and field.name != 'cache_version'
+            ]
+        super().save(*args, **kwargs)
 
 
 class MatchPlayer(models.Model):
@@ -140,9 +326,184 @@ class MatchPlayer(models.Model):
         max_length=5, choices=AVAILABILITY_CHOICES, default='maybe'
     )
     selected = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ['match', 'player']
+        indexes = [
+            # Roster buckets and counters for a match
+            models.Index(
+                fields=['match', 'availability', 'selected'],
+                name='matchplayer_status_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.player.name} - {self.match}"
+
+
+class FeeCharge(models.Model):
+    """A match fee owed by a player selected for a completed match"""
+
+    match = models.ForeignKey(
+        Match, on_delete=models.CASCADE, related_name='fee_charges'
+    )
+    player = models.ForeignKey(
+        Player, on_delete=models.CASCADE, related_name='fee_charges'
+    )
+    amount = models.DecimalField(max_digits=5, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['match', 'player']
+
+    def __str__(self):
+        return f"{self.player.name} - {self.match} - {self.amount}"
+
+
+class FeePayment(models.Model):
+    """A payment made by a player towards their fees"""
+
+    player = models.ForeignKey(
+        Player, on_delete=models.CASCADE, related_name='fee_payments'
+    )
+    amount = models.DecimalField(max_digits=7, decimal_places=2)
+    note = models.CharField(max_length=100, blank=True)
+    recorded_by = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True,
+        related_name='fee_payments_recorded'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.player.name} paid {self.amount}"
+
+
+def season_stats_expressions(club_id, season):
+    """Expressions giving each PlayerSeasonStats counter for a player.
+
+    Annotate a Player queryset with these. Cancelled matches don't count.
+    """
+    season_matches = Match.objects.filter(
+        club_id=club_id, date__year=season).exclude(status='cancelled')
+
+    def responses(**filters):
+        return _count_subquery(
+            MatchPlayer.objects.filter(
+                player=OuterRef('pk'), match__in=season_matches, **filters),
+            'player')
+
+    return {
+        'matches': _count_subquery(season_matches, 'club'),
+        'responses': responses(),
+        'available': responses(availability='yes'),
+        'selections': responses(selected=True),
+        'appearances': responses(selected=True, match__status='completed'),
+        'fees_charged': _sum_subquery(
+            FeeCharge.objects.filter(
+                player=OuterRef('pk'), match__in=season_matches),
+            'player', 'amount'),
+    }
+
+
+class PlayerSeasonStats(models.Model):
+    """Per-player season summary, kept up to date by clubs.stats.
+
+    A season is a calendar year. Rebuild with rebuild_season_stats.
+    """
+
+    player = models.ForeignKey(
+        Player, on_delete=models.CASCADE, related_name='season_stats'
+    )
+    club = models.ForeignKey(
+        Club, on_delete=models.CASCADE, related_name='season_stats'
+    )
+    season = models.PositiveSmallIntegerField()
+    # Fixtures in the club's season, for the rates
+    matches = models.PositiveIntegerField(default=0)
+    responses = models.PositiveIntegerField(default=0)
+    available = models.PositiveIntegerField(default=0)
+    selections = models.PositiveIntegerField(default=0)
+    # Selected for a completed match
+    appearances = models.PositiveIntegerField(default=0)
+    fees_charged = models.DecimalField(
+        max_digits=8, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    STAT_FIELDS = [
+        'matches', 'responses', 'available', 'selections', 'appearances',
+        'fees_charged',
+    ]
+
+    class Meta:
+        unique_together = ['player', 'season']
+        indexes = [
+            # Season stats page for a club
+            models.Index(
+                fields=['club', 'season'],
+                name='season_stats_club_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.player.name} - {self.season}"
+
+    def _rate(self, count):
+        return round(100 * count / self.matches) if self.matches else 0
+
+    @property
+    def availability_rate(self):
+        """Percentage of the season's matches the player was available for"""
+        return self._rate(self.available)
+
+    @property
+    def selection_rate(self):
+        """Percentage of the season's matches the player was selected for"""
+        return self._rate(self.selections)
+
+
+class Job(models.Model):
+    """A unit of background work, run by the run_jobs worker.
+
+    name is a task registered in clubs.jobs; args and kwargs are passed
+    to it as JSON. Failed jobs are retried until max_attempts.
+    """
+
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    # Not run before this time (pushed back after each failure)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run_at', 'pk']
+        indexes = [
+            # Worker polling: due jobs, oldest first
+            models.Index(
+                fields=['run_at', 'id'],
+                condition=Q(status='queued'),
+                name='job_queued_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
@@ -0,0 +1,108 @@
+"""
+Team selection suggestions with rotation fairness.
+
+suggest_team() proposes players to fill the rest of a match's team from
+those who said yes (then maybe). Two queries load everything it needs:
+the match roster, and every response to the club's earlier matches that
+season. The history is walked once into per-player arrays, and players
+are ranked by how often they have been left out against how often (and
+how recently) they have played.
+"""
+from .models import MatchPlayer
+from .services import roster_players
+
+TEAM_SIZE = 11
+# Roles that can lead the side; a suggestion includes at least one
+LEADER_ROLES = ('admin', 'captain')
+# Weight of each time a player was available but left out
+LEFT_OUT_WEIGHT = 2
+# Matches without a game after which a player gets no further credit
+REST_CAP = 3
+
+
+def season_history(match):
+    """(match id, player id, availability, selected) for the club's
+    earlier, non-cancelled matches this season, oldest match first"""
+    return MatchPlayer.objects.filter(
+        match__club_id=match.club_id,
+        match__date__year=match.date.year,
+        match__date__lt=match.date,
+    ).exclude(
+        match__status='cancelled'
+    ).order_by(
+        'match__date', 'match_id'
+    ).values_list('match_id', 'player_id', 'availability', 'selected')
+
+
+def fairness_scores(players, history):
+    """Score players from their season history, in a single pass.
+
+    Sets appearances, left_out and fairness on each player; higher
+    fairness means a stronger claim to a place.
+    """
+    index = {player.pk: position for position, player in enumerate(players)}
+    appearances = [0] * len(players)
+    left_out = [0] * len(players)
+    last_played = [-1] * len(players)
+
+    played = -1
+    previous_match = None
+    for match_id, player_id, availability, selected in history:
+        if match_id != previous_match:
+            played += 1
+            previous_match = match_id
+        position = index.get(player_id)
+        if position is None:
+            continue
+        if selected:
+            appearances[position] += 1
+            last_played[position] = played
+        elif availability == 'yes':
+            left_out[position] += 1
+
+    for position, player in enumerate(players):
+        rested = min(played - last_played[position], REST_CAP)
+        player.appearances = appearances[position]
+        player.left_out = left_out[position]
+        player.fairness = (
+            LEFT_OUT_WEIGHT * left_out[position] - appearances[position]
+            + rested)
+    return players
+
+
+def suggest_team(match, roster=None, size=TEAM_SIZE):
+    """Players to add to a match's team, best claim first.
+
+    roster is the match's roster_players(), if already loaded. Players
+    already selected keep their places and count towards size.
+    Available players are preferred to maybes; among them, the fairest
+    pick wins, ties going by name. If nobody selected can lead the side,
+    the best-placed admin or captain is included.
+    """
+    if roster is None:
+        roster = roster_players(match)
+    selected = [player for player in roster if player.is_selected]
+    candidates = [
+        player for player in roster
+        if not player.is_selected and player.availability in ('yes', 'maybe')
+    ]
+    fairness_scores(candidates, season_history(match))
+    candidates.sort(key=lambda player: (
+        player.availability != 'yes', -player.fairness, player.name.lower()))
+
+    slots = max(size - len(selected), 0)
+    picks = []
+    if slots and not any(p.role in LEADER_ROLES for p in selected):
+        leader = next(
+            (p for p in candidates if p.role in LEADER_ROLES), None)
+        if leader is not None:
+            picks.append(leader)
+    for player in candidates:
+        if len(picks) >= slots:
+            break
+        if player not in picks:
+            picks.append(player)
+    # The leader may have been picked ahead of better claims
+    rank = {player.pk: rank for rank, player in enumerate(candidates)}
+    picks.sort(key=lambda player: rank[player.pk])
+    return picks
@@ -0,0 +1,468 @@
+import csv
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import F, FilteredRelation, Q
+
+from .fees import sync_team_fees
+from .forms import PlayerForm
+from .live import publish_roster_changes
+from .models import Player, Match, MatchPlayer
+from .stats import refresh_match_stats, refresh_season_stats
+
+# Bulk actions from the team selection / availability pages:
+# action -> (availability for new rows, selected, fields to overwrite)
+ROSTER_ACTIONS = {
+    'set_available': ('yes', False, ['availability']),
+    'set_maybe': ('maybe', False, ['availability']),
+    'set_unavailable': ('no', False, ['availability']),
+    'add_to_team': ('yes', True, ['selected']),
+    'remove_from_team': ('yes', False, ['selected']),
+}
+
+
+def roster_queryset(match):
+    """Active club players LEFT JOINed to this match's MatchPlayer rows.
+
+    Players who haven't responded come back with match_availability None.
+    """
+    return Player.objects.for_club(match.club_id).active().annotate(
+        this_match=FilteredRelation(
+            'match_appearances',
+            condition=Q(match_appearances__match=match),
+        ),
+        match_availability=F('this_match__availability'),
+        match_selected=F('this_match__selected'),
+    )
+
+
+def roster_players(match, user=None):
+    """Load every active club player with their status for a match"""
+    roster = []
+    for player in roster_queryset(match):
+        player.availability = player.match_availability
+        player.is_selected = bool(player.match_selected)
+        player.is_current_user = (
+            user is not None and player.user_id == user.pk)
+        roster.append(player)
+    return roster
+
+
+def build_roster(match, user=None, split_selected=True):
+    """Split a match's roster into selected/available/maybe/awaiting/
+    unavailable lists.
+
+    With split_selected=False selected players stay in their availability
+    bucket and 'selected' is left empty (bulk availability view).
+    """
+    roster = {
+        'selected': [],
+        'available': [],
+        'maybe': [],
+        'awaiting': [],
+        'unavailable': [],
+    }
+    for player in roster_players(match, user):
+        if split_selected and player.is_selected:
+            roster['selected'].append(player)
+        elif player.availability == 'yes':
+            roster['available'].append(player)
+        elif player.availability == 'maybe':
+            roster['maybe'].append(player)
+        elif player.availability is None:
+            roster['awaiting'].append(player)
+        else:
+            roster['unavailable'].append(player)
+    return roster
+
+
+def _write_match_players(rows, update_fields):
+    """Insert MatchPlayer rows, overwriting update_fields on existing ones.
+
+    One INSERT ... ON CONFLICT statement. Live roster streams are sent
+    the changes: the whole row for new rows, the changed fields for
+    existing ones. Follow with _roster_written().
+    """
+    match_ids = {row.match_id for row in rows}
+    # bulk_create doesn't report which rows were inserted
+    existing = set(MatchPlayer.objects.filter(
+        match_id__in=match_ids,
+        player_id__in={row.player_id for row in rows},
+    ).values_list('match_id', 'player_id'))
+    if update_fields:
+        MatchPlayer.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['match', 'player'],
+            update_fields=update_fields + ['updated_at'],
+        )
+    else:
+        MatchPlayer.objects.bulk_create(rows, ignore_conflicts=True)
+
+    changes = {}
+    for row in rows:
+        if (row.match_id, row.player_id) not in existing:
+            fields = ['availability', 'selected']
+        elif update_fields:
+            fields = update_fields
+        else:
+            continue
+        changes.setdefault(row.match_id, []).append({
+            'id': row.player_id,
+            **{field: getattr(row, field) for field in fields},
+        })
+    for match_id, players in changes.items():
+        publish_roster_changes(match_id, players)
+
+
+def _roster_written(rows):
+    """Bring everything derived from MatchPlayer rows up to date.
+
+    bulk_create skips signals, so after any bulk roster writes the
+    counters of every touched match are refreshed in one UPDATE,
+    completed matches have their fees brought in line with the team,
+    and the touched players' season stats are refreshed.
+    """
+    players = {}
+    for row in rows:
+        players.setdefault(row.match_id, set()).add(row.player_id)
+    Match.objects.filter(pk__in=players).refresh_counts()
+    sync_team_fees(players)
+    refresh_match_stats(players)
+
+
+def _upsert_match_players(rows, update_fields):
+    """_write_match_players() then _roster_written(). Returns the number
+    of rows written."""
+    _write_match_players(rows, update_fields)
+    _roster_written(rows)
+    return len(rows)
+
+
+def apply_roster_action(match, player_ids, action):
+    """Apply a ROSTER_ACTIONS action to many players for one match.
+
+    Ids that aren't players of the match's club are ignored. Returns the
+    number of players updated.
+    """
+    availability, selected, update_fields = ROSTER_ACTIONS[action]
+    with transaction.atomic():
+        valid_ids = Player.objects.for_club(match.club_id).filter(
+            pk__in=player_ids
+        ).values_list('pk', flat=True)
+        rows = [
+            MatchPlayer(
+                match=match, player_id=player_id,
+                availability=availability, selected=selected)
+            for player_id in valid_ids
+        ]
+        if not rows:
+            return 0
+        return _upsert_match_players(rows, update_fields)
+
+
+def apply_player_action(player, match_ids, availability=None,
+                        team_action=None):
+    """Set one player's availability and/or selection for many matches.
+
+    team_action is 'add' or 'remove'. Ids that aren't matches of the
+    player's club are ignored. Returns the number of matches updated.
+    """
+    update_fields = []
+    if availability:
+        update_fields.append('availability')
+    if team_action in ('add', 'remove'):
+        update_fields.append('selected')
+
+    with transaction.atomic():
+        valid_ids = Match.objects.for_club(player.club_id).filter(
+            pk__in=match_ids
+        ).values_list('pk', flat=True)
+        rows = [
+            MatchPlayer(
+                match_id=match_id, player=player,
+                availability=availability or 'maybe',
+                selected=(team_action == 'add'))
+            for match_id in valid_ids
+        ]
+        if not rows:
+            return 0
+        return _upsert_match_players(rows, update_fields)
+
+
+def _bucket_responses(responses):
+    """Split MatchPlayer rows into selected/available/maybe/unavailable,
+    each sorted by player name"""
+    detail = {
+        'selected': [],
+        'available': [],
+        'maybe': [],
+        'unavailable': [],
+    }
+    for mp in sorted(responses, key=lambda mp: mp.player.name):
+        if mp.selected:
+            detail['selected'].append(mp)
+        elif mp.availability == 'yes':
+            detail['available'].append(mp)
+        elif mp.availability == 'maybe':
+            detail['maybe'].append(mp)
+        else:
+            detail['unavailable'].append(mp)
+    return detail
+
+
+def _not_responded(match, responses):
+    return Player.objects.for_club(match.club_id).active().exclude(
+        pk__in=[mp.player_id for mp in responses]
+    )
+
+
+def build_match_detail(match):
+    """Bucket a match's responses for the match detail page.
+
+    Two queries in total: the MatchPlayer rows with their players, and
+    the active players who haven't responded. Lists are sorted by name.
+    """
+    responses = list(match.match_players.select_related('player'))
+    detail = _bucket_responses(responses)
+    detail['not_responded'] = list(_not_responded(match, responses))
+    return detail
+
+
+async def abuild_match_detail(match):
+    """build_match_detail() with the async ORM"""
+    responses = [
+        mp async for mp in match.match_players.select_related('player')]
+    detail = _bucket_responses(responses)
+    detail['not_responded'] = [
+        player async for player in _not_responded(match, responses)]
+    return detail
+
+
+def apply_availability_batch(membership, items):
+    """Set availability/selection for many (match, player) pairs at once.
+
+    items are dicts with 'match', 'player' and at least one of
+    'availability' and 'selected'. Admins and captains may update anyone
+    in their club; other members only their own availability. All
+    permissions are checked from two queries, valid items are written in
+    one transaction, and a result is returned for every item.
+    """
+    def as_id(value):
+        # Ids come from JSON; anything but a plain integer is unknown
+        return value if type(value) is int else None
+
+    choices = {value for value, label in MatchPlayer.AVAILABILITY_CHOICES}
+    match_clubs = dict(Match.objects.filter(
+        pk__in={as_id(item.get('match')) for item in items} - {None}
+    ).values_list('pk', 'club_id'))
+    players = {
+        player['pk']: player for player in Player.objects.filter(
+            pk__in={as_id(item.get('player')) for item in items} - {None}
+        ).values('pk', 'club_id', 'user_id')
+    }
+
+    results = []
+    # update_fields -> rows, as each group needs its own upsert
+    groups = {}
+    seen = set()
+    for index, item in enumerate(items):
+        error = None
+        match_id = as_id(item.get('match'))
+        player = players.get(as_id(item.get('player')))
+        availability = item.get('availability')
+        selected = item.get('selected')
+
+        if match_id not in match_clubs or player is None:
+            error = 'Unknown match or player.'
+        elif match_clubs[match_id] != player['club_id']:
+            error = 'Player is not in the match club.'
+        elif availability is None and selected is None:
+            error = 'Nothing to update.'
+        elif availability is not None and (
+                not isinstance(availability, str)
+                or availability not in choices):
+            error = f'Invalid availability: {availability}.'
+        elif selected is not None and not isinstance(selected, bool):
+            error = 'selected must be true or false.'
+        elif not membership.is_admin_or_captain(player['club_id']) and (
+                player['user_id'] != membership.user_id
+                or selected is not None):
+            error = 'Permission denied.'
+        elif (match_id, player['pk']) in seen:
+            error = 'Duplicate match and player.'
+
+        if error:
+            results.append({'index': index, 'ok': False, 'error': error})
+            continue
+
+        seen.add((match_id, player['pk']))
+        update_fields = []
+        if availability is not None:
+            update_fields.append('availability')
+        if selected is not None:
+            update_fields.append('selected')
+        groups.setdefault(tuple(update_fields), []).append(MatchPlayer(
+            match_id=match_id,
+            player_id=player['pk'],
+            # New rows: a selected player is assumed available
+            availability=availability or ('yes' if selected else 'maybe'),
+            selected=bool(selected),
+        ))
+        results.append({'index': index, 'ok': True})
+
+    with transaction.atomic():
+        for update_fields, rows in groups.items():
+            _write_match_players(rows, list(update_fields))
+        # Counters, fees and stats once for the whole batch
+        _roster_written([row for rows in groups.values() for row in rows])
+    return results
+
+
+# Columns read from a player import file (only name is required)
+IMPORT_COLUMNS = ['name', 'email', 'phone', 'role']
+
+
+def parse_player_csv(lines):
+    """Read player rows from CSV text lines with a header row.
+
+    Header names are matched case-insensitively and unknown columns are
+    ignored. Raises ValueError if there is no name column.
+    """
+    reader = csv.DictReader(lines)
+    columns = {
+        (header or '').strip().lower(): header
+        for header in reader.fieldnames or []
+    }
+    if 'name' not in columns:
+        raise ValueError('The file needs a "name" column.')
+    return [
+        {
+            column: (row.get(columns[column]) or '').strip()
+            for column in IMPORT_COLUMNS if column in columns
+        }
+        for row in reader
+    ]
+
+
+def link_players_by_email(club_id=None, pk_range=None):
+    """Link unlinked players to the user with the same email.
+
+    A single UPDATE ... FROM joining Player.email_lower to the lower-cased
+    user emails; where several users share an email the oldest account
+    wins. Can be limited to one club and/or a (first, last) range of
+    player ids. Returns the number of players linked.
+    """
+    quote = connection.ops.quote_name
+    conditions = []
+    params = []
+    if club_id is not None:
+        conditions.append('AND p.club_id = %s')
+        params.append(club_id)
+    if pk_range is not None:
+        conditions.append('AND p.id BETWEEN %s AND %s')
+        params.extend(pk_range)
+    sql = f"""
+        UPDATE {quote(Player._meta.db_table)} AS p
+        SET user_id = u.id
+        FROM (
+            SELECT LOWER(email) AS email_lower, MIN(id) AS id
+            FROM {quote(get_user_model()._meta.db_table)}
+            WHERE email <> ''
+            GROUP BY LOWER(email)
+        ) AS u
+        WHERE p.user_id IS NULL
+        AND p.email_lower = u.email_lower
+        {' '.join(conditions)}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+def import_players(club, rows):
+    """Validate and create many players for a club in a few statements.
+
+    rows are dicts as returned by parse_player_csv(). Each row is checked
+    with PlayerForm, and emails already used in the club (or earlier in
+    the rows) are rejected. Valid rows are inserted with bulk_create, so
+    the Player signals don't run: users are linked by email in one UPDATE
+    and the club's match counters refreshed in another.
+
+    Returns (number created, [(row number, message), ...]); row numbers
+    count the header as row 1, as a spreadsheet would.
+    """
+    taken = set(
+        Player.objects.for_club(club.pk).exclude(email='')
+        .values_list('email_lower', flat=True))
+
+    players = []
+    errors = []
+    for number, row in enumerate(rows, start=2):
+        form = PlayerForm({**row, 'role': row.get('role') or 'player'})
+        if not form.is_valid():
+            for field, messages in form.errors.items():
+                errors.append((number, f"{field}: {' '.join(messages)}"))
+            continue
+        email = form.cleaned_data['email'].lower()
+        if email and email in taken:
+            errors.append((number, f'email: {email} is already in the club.'))
+            continue
+        taken.add(email)
+        player = form.save(commit=False)
+        player.club = club
+        players.append(player)
+
+    if players:
+        with transaction.atomic():
+            Player.objects.bulk_create(players, batch_size=1000)
+            link_players_by_email(club_id=club.pk)
+            Match.objects.for_club(club.pk).refresh_counts()
+    return len(players), errors
+
+
+def fill_venue(match, club):
+    """Default an empty venue to the home ground of whoever is hosting"""
+    if not match.venue or not match.venue.strip():
+        if match.is_home:
+            match.venue = club.home_ground
+        else:
+            match.venue = match.opposition.home_ground
+
+
+def create_fixture_series(club, first_date, last_date, oppositions,
+                          every_weeks=1, first_is_home=True, time=None,
+                          match_fee=None):
+    """Schedule a match every few weeks from first_date to last_date.
+
+    Oppositions are played in turn and home/away alternates, with venues
+    filled in as match_create does. All matches are inserted with one
+    bulk_create, so the Match signals don't run: counters are filled in
+    one UPDATE and season stats refreshed once per season. Returns the
+    new matches.
+    """
+    if match_fee is None:
+        match_fee = club.default_match_fee
+    matches = []
+    match_date = first_date
+    while match_date <= last_date:
+        match = Match(
+            club=club,
+            opposition=oppositions[len(matches) % len(oppositions)],
+            date=match_date,
+            time=time,
+            is_home=(len(matches) % 2 == 0) == first_is_home,
+            match_fee=match_fee,
+        )
+        fill_venue(match, club)
+        matches.append(match)
+        match_date += timedelta(weeks=every_weeks)
+
+    with transaction.atomic():
+        Match.objects.bulk_create(matches)
+        Match.objects.filter(
+            pk__in=[match.pk for match in matches]).refresh_counts()
+        for season in sorted({match.date.year for match in matches}):
+            refresh_season_stats(club.pk, season)
+    return matches
@@ -1,7 +1,14 @@
-from django.db.models.signals import post_save
+from django.db.models import QuerySet, Value
+from django.db.models.functions import Lower
+from django.db.models.signals import (
+    pre_save, post_save, pre_delete, post_delete,
+)
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import Player
+from .fees import sync_match_fees, sync_team_fees, void_match_fees
+from .live import publish_roster_changes
+from .stats import refresh_match_stats, refresh_season_stats
+from .models import Club, Player, Opposition, Match, MatchPlayer
 
 User = get_user_model()
 
@@ -10,17 +17,190 @@ User = get_user_model()
 def link_user_to_players(sender, instance, created, **kwargs):
     """When user signs up, link to ALL matching unlinked Players"""
     if created and instance.email:
+        # One UPDATE on the indexed email_lower column. Lowered by the
+        # database, as email_lower is (SQLite only folds ASCII letters)
         Player.objects.filter(
-            email__iexact=instance.email,
+            email_lower=Lower(Value(instance.email)),
             user__isnull=True
         ).update(user=instance)
 
 
+@receiver(pre_save, sender=Player)
+def link_player_to_user(sender, instance, raw=False, **kwargs):
+    """Link a new Player to an existing User with the same email.
+
+    Runs before the INSERT, so the player is only saved once. The lookup
+    uses the LOWER(email) index on the user table.
+    """
+    if (instance._state.adding and not raw and instance.email
+            and instance.user_id is None):
+        instance.user = User.objects.alias(
+            email_lower=Lower('email')
+        ).filter(
+            email_lower=Lower(Value(instance.email))
+        ).order_by('pk').first()
+
+
+@receiver(post_save, sender=MatchPlayer)
+@receiver(post_delete, sender=MatchPlayer)
+def update_match_counts(sender, instance, **kwargs):
+    """Keep the match's roster counters in step with its MatchPlayer rows"""
+    Match.objects.filter(pk=instance.match_id).refresh_counts()
+
+
+@receiver(post_save, sender=MatchPlayer)
+def publish_match_player(sender, instance, **kwargs):
+    """Send the saved row to live roster streams"""
+    publish_roster_changes(instance.match_id, [{
+        'id': instance.player_id,
+        'availability': instance.availability,
+        'selected': instance.selected,
+    }])
+
+
+@receiver(post_delete, sender=MatchPlayer)
+def publish_match_player_deleted(sender, instance, **kwargs):
+    """A deleted row puts the player back to awaiting"""
+    publish_roster_changes(instance.match_id, [{
+        'id': instance.player_id,
+        'availability': None,
+        'selected': False,
+    }])
+
+
+@receiver(post_save, sender=Match)
+def refresh_saved_match(sender, instance, created, **kwargs):
+    """Count a new match's roster; any edit bumps its cache version"""
+    Match.objects.filter(pk=instance.pk).refresh_counts()
+
+
+@receiver(post_save, sender=Match)
+def charge_completed_match(sender, instance, raw=False, **kwargs):
+    """Completing a match charges its team; reopening it voids the fees"""
+    if not raw:
+        sync_match_fees(instance)
+
+
+@receiver(post_save, sender=MatchPlayer)
+def update_team_fees(sender, instance, raw=False, **kwargs):
+    """Changing a completed match's team charges or voids fees"""
+    if not raw:
+        sync_team_fees([instance.match_id])
+
+
+@receiver(pre_delete, sender=Match)
+def void_deleted_match_fees(sender, instance, **kwargs):
+    """Take a deleted match's fees back off player balances"""
+    void_match_fees(instance)
+
+
+def _deleting(origin, model):
+    """Whether a delete (and its cascade) was started on model rows.
+
+    Stats rows mustn't be rewritten for a player, match or club that is
+    part way through being deleted.
+    """
+    if isinstance(origin, QuerySet):
+        return origin.model is model
+    return isinstance(origin, model)
+
+
+@receiver(post_save, sender=MatchPlayer)
+def update_player_season_stats(sender, instance, **kwargs):
+    """A response changes that player's season stats"""
+    refresh_match_stats({instance.match_id: [instance.player_id]})
+
+
+@receiver(post_delete, sender=MatchPlayer)
+def update_deleted_response_season_stats(sender, instance, origin=None,
+                                         **kwargs):
+    """Removing a response (but not its player or match) changes fees
+    and stats"""
+    if _deleting(origin, MatchPlayer):
+        sync_team_fees([instance.match_id])
+        refresh_match_stats({instance.match_id: [instance.player_id]})
+
+
+@receiver(pre_save, sender=Match)
+def remember_match_season(sender, instance, raw=False, **kwargs):
+    """Note the season an edited match is in before it is saved"""
+    instance._previous_season = None
+    if not instance._state.adding and not raw:
+        previous = Match.objects.filter(
+            pk=instance.pk).values_list('date', flat=True).first()
+        if previous is not None:
+            instance._previous_season = previous.year
+
+
+@receiver(post_save, sender=Match)
+def update_club_season_stats(sender, instance, raw=False, **kwargs):
+    """A new, moved or (re)scored match changes the whole club season.
+
+    Registered after charge_completed_match, so fees are counted.
+    """
+    if raw:
+        return
+    season = instance.date.year
+    refresh_season_stats(instance.club_id, season)
+    previous = getattr(instance, '_previous_season', None)
+    if previous not in (None, season):
+        refresh_season_stats(instance.club_id, previous)
+
+
+@receiver(post_delete, sender=Match)
+def update_deleted_match_season_stats(sender, instance, origin=None,
+                                      **kwargs):
+    """Deleting a match (but not its club) changes the club season"""
+    if _deleting(origin, Match):
+        refresh_season_stats(instance.club_id, instance.date.year)
+
+
+@receiver(post_save, sender=Opposition)
+def invalidate_opposition_matches(sender, instance, **kwargs):
+    """Match cards show the opposition name"""
+    Match.objects.filter(opposition=instance).bump_cache_version()
+
+
+@receiver(post_save, sender=Club)
+def invalidate_club_matches(sender, instance, created, **kwargs):
+    """Match pages show the club name"""
+    if not created:
+        Match.objects.filter(club=instance).bump_cache_version()
+
+
+@receiver(pre_save, sender=Player)
+def remember_player_roster_state(sender, instance, raw=False, **kwargs):
+    """Note an edited player's club and active flag before it is saved"""
+    instance._previous_roster_state = None
+    if not instance._state.adding and not raw:
+        instance._previous_roster_state = Player.objects.filter(
+            pk=instance.pk).values_list('club_id', 'is_active').first()
+
+
 @receiver(post_save, sender=Player)
-def link_player_to_user(sender, instance, created, **kwargs):
-    """When Player created, link to existing User if email matches"""
-    if created and instance.email and not instance.user:
-        user = User.objects.filter(email__iexact=instance.email).first()
-        if user:
-            instance.user = user
-            instance.save()
+def update_club_match_counts(sender, instance, created, raw=False,
+                             **kwargs):
+    """Joining, moving or (de)activating a player changes awaiting counts.
+
+    Other edits (name, phone...) leave the counters, and so every cached
+    match page, alone.
+    """
+    if raw:
+        return
+    previous = getattr(instance, '_previous_roster_state', None)
+    current = (instance.club_id, instance.is_active)
+    if not created and previous in (None, current):
+        return
+    club_ids = {instance.club_id}
+    if previous is not None:
+        club_ids.add(previous[0])
+    Match.objects.filter(club_id__in=club_ids).refresh_counts()
+
+
+@receiver(post_delete, sender=Player)
+def update_deleted_player_match_counts(sender, instance, origin=None,
+                                       **kwargs):
+    """A player leaving changes awaiting counts (unless their club, and
+    its matches, are going too)"""
+    if not _deleting(origin, Club):
+        Match.objects.filter(club_id=instance.club_id).refresh_counts()
@@ -0,0 +1,76 @@
+"""
+Per-player season statistics, kept in the PlayerSeasonStats table.
+
+Each refresh recomputes the rows for one club season - all its players,
+or just the ones whose responses changed - with one aggregate query and
+one upsert. clubs.signals refreshes the players behind every MatchPlayer
+write and the whole club season when a match is added, moved, completed,
+cancelled or deleted; the bulk roster writes in clubs.services refresh
+the players they touched. The stats page reads only from this table.
+"""
+from django.db import transaction
+
+from .models import (
+    Match, Player, PlayerSeasonStats, season_stats_expressions,
+)
+
+
+def refresh_season_stats(club_id, season, player_ids=None):
+    """Recompute the stats rows for a club season.
+
+    player_ids limits the refresh to those players (default: the whole
+    club). Returns the number of rows written.
+    """
+    players = Player.objects.for_club(club_id)
+    if player_ids is not None:
+        players = players.filter(pk__in=player_ids)
+    fields = PlayerSeasonStats.STAT_FIELDS
+    rows = [
+        PlayerSeasonStats(
+            player_id=row['pk'], club_id=club_id, season=season,
+            **{field: row[field] for field in fields})
+        for row in players.annotate(
+            **season_stats_expressions(club_id, season)
+        ).values('pk', *fields)
+    ]
+    if rows:
+        PlayerSeasonStats.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['player', 'season'],
+            update_fields=fields + ['updated_at'],
+        )
+    return len(rows)
+
+
+def refresh_match_stats(player_ids_by_match):
+    """Refresh stats for the given players of each match's club season.
+
+    Takes {match id: player ids}. Matches in the same club season are
+    refreshed together.
+    """
+    seasons = {}
+    for match_id, club_id, match_date in Match.objects.filter(
+            pk__in=player_ids_by_match).values_list('pk', 'club_id', 'date'):
+        seasons.setdefault((club_id, match_date.year), set()).update(
+            player_ids_by_match[match_id])
+    for (club_id, season), player_ids in seasons.items():
+        refresh_season_stats(club_id, season, player_ids)
+
+
+def rebuild_season_stats(club_id=None):
+    """Recompute every stats row from scratch (optionally for one club).
+
+    Returns the number of club seasons rebuilt.
+    """
+    matches = Match.objects.all()
+    stats = PlayerSeasonStats.objects.all()
+    if club_id is not None:
+        matches = matches.filter(club_id=club_id)
+        stats = stats.filter(club_id=club_id)
+    seasons = sorted(set(matches.values_list('club_id', 'date__year')))
+    with transaction.atomic():
+        stats.delete()
+        for club, season in seasons:
+            refresh_season_stats(club, season)
+    return len(seasons)
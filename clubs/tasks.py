@@ -0,0 +1,80 @@
+"""
+Background tasks, run by the run_jobs worker (see clubs.jobs).
+
+Queue them with enqueue(task, *args). Tasks take ids rather than model
+instances and cope with the objects having been deleted since.
+"""
+from django.core.mail import send_mail
+from django.db.models import Exists, OuterRef
+
+from .jobs import enqueue_many, task
+from .models import Match, MatchPlayer, Player
+from .stats import rebuild_season_stats
+
+
+def _awaiting_players(match):
+    """Active club players with an email who haven't responded"""
+    return Player.objects.for_club(match.club_id).active().exclude(
+        email=''
+    ).exclude(
+        Exists(MatchPlayer.objects.filter(
+            match=match, player=OuterRef('pk')))
+    )
+
+
+def _scheduled_match(match_id):
+    return Match.objects.select_related('club', 'opposition').filter(
+        pk=match_id, status='scheduled').first()
+
+
+@task
+def send_availability_requests(match_id, availability_url):
+    """Queue an availability request email to every active player yet to
+    respond to a match.
+
+    availability_url is the absolute link players follow to respond.
+    One job per player, so a retry never emails the others again.
+    Returns the number of emails queued.
+    """
+    match = _scheduled_match(match_id)
+    if match is None:
+        return 0
+    return len(enqueue_many(send_availability_request, [
+        (match_id, player_id, availability_url)
+        for player_id in _awaiting_players(match).values_list(
+            'pk', flat=True)
+    ]))
+
+
+@task
+def send_availability_request(match_id, player_id, availability_url):
+    """Email one player, unless they have responded in the meantime.
+
+    Returns the number of emails sent.
+    """
+    match = _scheduled_match(match_id)
+    if match is None:
+        return 0
+    email = _awaiting_players(match).filter(
+        pk=player_id).values_list('email', flat=True).first()
+    if email is None:
+        return 0
+
+    subject = (
+        f'{match.club.name} v {match.opposition.name}, '
+        f'{match.date:%a %d %b}: are you available?')
+    when = f'{match.date:%A %d %B}'
+    if match.time:
+        when += f' at {match.time:%H:%M}'
+    body = (
+        f'{match.club.name} play {match.opposition.name} on {when}'
+        f' ({match.venue or "venue TBC"}).\n\n'
+        f'Please let your captain know if you can play:\n'
+        f'{availability_url}\n')
+    return send_mail(subject, body, None, [email])
+
+
+@task
+def rebuild_club_season_stats(club_id):
+    """Recompute a club's season stats from its match history"""
+    return rebuild_season_stats(club_id)
@@ -0,0 +1,55 @@
+from django import template
+
+from clubs.fragments import fragment_cache, match_fragment_key, record
+
+register = template.Library()
+
+
+class MatchCacheNode(template.Node):
+
+    def __init__(self, nodelist, name, match, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.match = match
+        self.vary_on = vary_on
+
+    def render(self, context):
+        match = self.match.resolve(context)
+        key = match_fragment_key(
+            self.name.resolve(context), match,
+            [value.resolve(context) for value in self.vary_on])
+        cache = fragment_cache()
+        content = context.get('prefetched_fragments', {}).get(key)
+        if content is None:
+            content = cache.get(key)
+        if content is not None:
+            record('hit')
+            return content
+        record('miss')
+        content = self.nodelist.render(context)
+        cache.set(key, content)
+        return content
+
+
+@register.tag
+def matchcache(parser, token):
+    """Cache a fragment until the match or its roster changes.
+
+    Usage::
+
+        {% matchcache 'card' match [vary_on ...] %}
+            ...
+        {% endmatchcache %}
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires a fragment name and a match.")
+    nodelist = parser.parse(('endmatchcache',))
+    parser.delete_first_token()
+    return MatchCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
@@ -0,0 +1,1420 @@
+import asyncio
+import base64
+import csv
+import json
+from datetime import date
+from decimal import Decimal
+
+from io import StringIO
+from tempfile import NamedTemporaryFile
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import AsyncClient, Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import parse_http_date
+
+from .fragments import fragment_cache, fragment_stats
+from .jobs import claim_jobs, enqueue, requeue_stale_jobs, run_job, task
+from .live import broker, roster_events
+from .middleware import Membership
+from .fees import record_payment
+from .models import (
+    Club, Player, Opposition, Match, MatchPlayer, FeeCharge,
+    PlayerSeasonStats, Job,
+)
+from .selection import suggest_team
+from .services import (
+    build_roster, build_match_detail, apply_roster_action,
+    apply_player_action, import_players, parse_player_csv,
+    create_fixture_series,
+)
+
+
+class ClubDataMixin:
+    """Helpers for building a club with a squad and a fixture"""
+
+    def make_club(self):
+        self.user = User.objects.create_user(
+            'captain', 'captain@example.com', 'password')
+        self.club = Club.objects.create(
+            name='Test CC', home_ground='The Oval', created_by=self.user)
+        self.captain = Player.objects.create(
+            club=self.club, user=self.user, name='Captain',
+            email='captain@example.com', role='captain')
+        self.opposition = Opposition.objects.create(
+            club=self.club, name='Visitors CC')
+        self.match = Match.objects.create(
+            club=self.club, opposition=self.opposition,
+            date=date(2026, 6, 6))
+
+    def add_players(self, count):
+        """Add count players, cycling through each availability state"""
+        states = ['yes', 'maybe', 'no', None]
+        start = self.club.players.count()
+        for i in range(count):
+            player = Player.objects.create(
+                club=self.club, name=f'Player {start + i:03d}')
+            availability = states[i % len(states)]
+            if availability:
+                MatchPlayer.objects.create(
+                    match=self.match, player=player,
+                    availability=availability, selected=(i % 5 == 0))
+
+
+class RosterTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+
+    def test_build_roster_buckets(self):
+        self.add_players(8)
+        roster = build_roster(self.match, self.user)
+        selected = {p.name for p in roster['selected']}
+        self.assertEqual(selected, {'Player 001', 'Player 006'})
+        self.assertEqual(len(roster['available']), 1)
+        self.assertEqual(len(roster['maybe']), 1)
+        self.assertEqual(len(roster['unavailable']), 2)
+        # Captain plus two players have no MatchPlayer row
+        self.assertEqual(len(roster['awaiting']), 3)
+        captain = next(
+            p for p in roster['awaiting'] if p.pk == self.captain.pk)
+        self.assertTrue(captain.is_current_user)
+
+    def test_build_roster_without_split_keeps_selected_in_buckets(self):
+        self.add_players(8)
+        roster = build_roster(self.match, split_selected=False)
+        self.assertEqual(roster['selected'], [])
+        self.assertEqual(len(roster['available']), 2)
+        self.assertTrue(roster['available'][0].is_selected)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_roster_views_use_fixed_query_count(self):
+        self.client.force_login(self.user)
+        for name in ['team_selection', 'bulk_availability']:
+            url = reverse(name, args=[self.match.pk])
+            self.add_players(5)
+            small = self.count_queries(url)
+            self.add_players(40)
+            large = self.count_queries(url)
+            self.assertEqual(small, large, name)
+
+
+class MatchStatusTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+
+    def test_with_player_status_annotations(self):
+        self.add_players(8)
+        MatchPlayer.objects.create(
+            match=self.match, player=self.captain, availability='yes',
+            selected=True)
+        other = Match.objects.create(
+            club=self.club, opposition=self.opposition,
+            date=date(2026, 6, 13))
+
+        matches = list(
+            Match.objects.with_player_status(self.captain)
+            .in_display_order())
+        self.assertEqual(matches[0].pk, self.match.pk)
+        self.assertEqual(matches[0].my_availability, 'yes')
+        self.assertTrue(matches[0].is_selected)
+        self.assertEqual(matches[0].selected_count, 3)
+        self.assertEqual(matches[0].available_count, 1)
+        self.assertEqual(matches[0].maybe_count, 1)
+        self.assertEqual(matches[1].pk, other.pk)
+        self.assertIsNone(matches[1].my_availability)
+        self.assertFalse(matches[1].is_selected)
+        self.assertEqual(matches[1].selected_count, 0)
+
+    def test_match_pages_use_fixed_query_count(self):
+        self.client.force_login(self.user)
+        urls = [
+            reverse('match_list'),
+            reverse('my_availability'),
+            reverse('player_availability', args=[self.captain.pk]),
+        ]
+        for url in urls:
+            with CaptureQueriesContext(connection) as small:
+                self.client.get(url)
+            for day in range(1, 21):
+                Match.objects.create(
+                    club=self.club, opposition=self.opposition,
+                    date=date(2026, 7, day))
+            with CaptureQueriesContext(connection) as large:
+                self.client.get(url)
+            self.assertEqual(
+                len(small.captured_queries), len(large.captured_queries),
+                url)
+
+
+class MatchCounterTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+
+    def counts(self):
+        self.match.refresh_from_db()
+        return [getattr(self.match, f) for f in Match.COUNTER_FIELDS]
+
+    def test_counters_follow_match_player_changes(self):
+        # Only the captain, who hasn't responded
+        self.assertEqual(self.counts(), [0, 0, 0, 0, 1])
+        self.add_players(8)
+        self.assertEqual(self.counts(), [2, 1, 1, 2, 3])
+
+        mp = self.match.match_players.get(player__name='Player 002')
+        mp.availability = 'yes'
+        mp.save()
+        self.assertEqual(self.counts(), [2, 2, 0, 2, 3])
+
+        mp.delete()
+        self.assertEqual(self.counts(), [2, 1, 0, 2, 4])
+
+        self.captain.is_active = False
+        self.captain.save()
+        self.assertEqual(self.counts(), [2, 1, 0, 2, 3])
+
+    def test_only_roster_changes_to_players_recount(self):
+        self.match.refresh_from_db()
+        version = self.match.cache_version
+        self.captain.phone = '07700'
+        self.captain.save()
+        self.match.refresh_from_db()
+        # An edit that can't change the counters keeps cached pages
+        self.assertEqual(self.match.cache_version, version)
+
+        other = Club.objects.create(name='Other', created_by=self.user)
+        self.captain.club = other
+        self.captain.save()
+        self.assertEqual(self.counts(), [0, 0, 0, 0, 0])
+
+    def test_saving_stale_match_keeps_counters(self):
+        stale = Match.objects.get(pk=self.match.pk)
+        self.add_players(4)
+        stale.venue = 'Lord\'s'
+        stale.save()
+        self.assertEqual(self.counts(), [1, 0, 1, 1, 2])
+
+    def test_recount_command_repairs_drift(self):
+        self.add_players(4)
+        Match.objects.update(selected_count=9, awaiting_count=0)
+        out = StringIO()
+        call_command('recount_matches', stdout=out)
+        self.assertIn('Repaired 1 of 1 matches', out.getvalue())
+        self.assertEqual(self.counts(), [1, 0, 1, 1, 2])
+
+
+class BulkActionTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+
+    def test_roster_action_upserts_and_keeps_counters(self):
+        self.add_players(4)
+        ids = list(self.club.players.values_list('pk', flat=True))
+        other_club = Club.objects.create(name='Other', created_by=self.user)
+        outsider = Player.objects.create(club=other_club, name='Outsider')
+
+        updated = apply_roster_action(
+            self.match, ids + [outsider.pk], 'add_to_team')
+        self.assertEqual(updated, 5)
+        self.assertFalse(outsider.match_appearances.exists())
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.selected_count, 5)
+        self.assertEqual(self.match.awaiting_count, 0)
+        # Existing availability is kept when adding to the team
+        self.assertEqual(
+            self.match.match_players.get(
+                player__name='Player 003').availability, 'no')
+
+    def test_roster_action_query_count_is_constant(self):
+        self.add_players(30)
+        few = list(self.club.players.values_list('pk', flat=True)[:3])
+        many = list(self.club.players.values_list('pk', flat=True))
+        with CaptureQueriesContext(connection) as small:
+            apply_roster_action(self.match, few, 'set_maybe')
+        with CaptureQueriesContext(connection) as large:
+            apply_roster_action(self.match, many, 'set_maybe')
+        self.assertEqual(
+            len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(
+            self.match.match_players.filter(availability='maybe').count(),
+            31)
+
+    def test_player_action_across_matches(self):
+        second = Match.objects.create(
+            club=self.club, opposition=self.opposition,
+            date=date(2026, 6, 13))
+        updated = apply_player_action(
+            self.captain, [self.match.pk, second.pk], 'yes', 'add')
+        self.assertEqual(updated, 2)
+        rows = self.captain.match_appearances.all()
+        self.assertTrue(all(mp.selected for mp in rows))
+        self.assertTrue(all(mp.availability == 'yes' for mp in rows))
+
+        apply_player_action(self.captain, [second.pk], team_action='remove')
+        mp = self.captain.match_appearances.get(match=second)
+        self.assertFalse(mp.selected)
+        self.assertEqual(mp.availability, 'yes')
+
+    def test_team_selection_post(self):
+        self.add_players(2)
+        self.client.force_login(self.user)
+        ids = self.club.players.values_list('pk', flat=True)
+        response = self.client.post(
+            reverse('team_selection', args=[self.match.pk]),
+            {'action': 'set_available', 'selected': list(ids)})
+        self.assertRedirects(
+            response,
+            reverse('team_selection', args=[self.match.pk])
+            + '?open=selectedPlayers')
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.available_count, 2)
+
+
+class MembershipTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+
+    def test_membership_roles(self):
+        other_club = Club.objects.create(name='Other', created_by=self.user)
+        Player.objects.create(club=other_club, user=self.user, name='Me')
+        membership = Membership(self.user)
+        self.assertTrue(membership.is_admin_or_captain(self.club.pk))
+        self.assertFalse(membership.is_admin_or_captain(other_club.pk))
+        self.assertEqual(
+            membership.player_for(other_club.pk).name, 'Me')
+        self.assertEqual(len(membership.clubs), 2)
+
+    def test_active_club_follows_the_session(self):
+        other_club = Club.objects.create(name='Other CC', created_by=self.user)
+        Player.objects.create(club=other_club, user=self.user, name='Me')
+        away = Opposition.objects.create(club=other_club, name='Rivals XI')
+        Match.objects.create(
+            club=other_club, opposition=away, date=date(2026, 6, 20))
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('match_list'))
+        self.assertContains(response, 'Visitors CC')
+        self.assertNotContains(response, 'Rivals XI')
+
+        response = self.client.post(
+            reverse('switch_club'), {'club': other_club.pk})
+        self.assertRedirects(response, reverse('match_list'))
+        response = self.client.get(reverse('match_list'))
+        self.assertContains(response, 'Rivals XI')
+        self.assertNotContains(response, 'Visitors CC')
+        self.assertEqual(response.context['current_player'].name, 'Me')
+        self.assertEqual(
+            self.client.get(reverse('player_list')).context['club'],
+            other_club)
+
+        # Only the user's own clubs can be made active
+        outsider = Club.objects.create(name='Not Mine', created_by=self.user)
+        response = self.client.post(
+            reverse('switch_club'), {'club': outsider.pk})
+        self.assertEqual(response.status_code, 403)
+
+    def test_club_scoped_querysets(self):
+        other_club = Club.objects.create(name='Other', created_by=self.user)
+        Player.objects.create(club=other_club, name='Elsewhere')
+        Player.objects.create(
+            club=self.club, name='Retired', is_active=False)
+        self.assertEqual(
+            list(Player.objects.for_club(self.club.pk).active()),
+            [self.captain])
+        self.assertEqual(
+            list(Match.objects.for_club(other_club.pk)), [])
+        self.assertEqual(
+            list(Opposition.objects.for_club(self.club.pk)),
+            [self.opposition])
+
+    def test_player_lookup_runs_once_per_request(self):
+        self.client.force_login(self.user)
+        for name, args in [('match_list', []),
+                           ('team_selection', [self.match.pk]),
+                           ('match_detail', [self.match.pk])]:
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(reverse(name, args=args))
+            player_lookups = [
+                q for q in context.captured_queries
+                if 'FROM "clubs_player"' in q['sql']
+                and '"clubs_player"."user_id" =' in q['sql']
+            ]
+            self.assertEqual(len(player_lookups), 1, name)
+
+
+class EmailLinkingTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+
+    def test_new_player_is_linked_in_one_insert(self):
+        with CaptureQueriesContext(connection) as context:
+            player = Player.objects.create(
+                club=self.club, name='Me', email='CAPTAIN@example.com')
+        self.assertEqual(player.user, self.user)
+        player_writes = [
+            q for q in context.captured_queries
+            if q['sql'].startswith(('INSERT INTO "clubs_player"',
+                                    'UPDATE "clubs_player"'))]
+        self.assertEqual(len(player_writes), 1)
+
+    def test_signup_links_matching_players(self):
+        player = Player.objects.create(
+            club=self.club, name='Later', email='Later@Example.com')
+        user = User.objects.create_user('later', 'later@example.com')
+        player.refresh_from_db()
+        self.assertEqual(player.user, user)
+
+    def test_non_ascii_emails_are_lowered_like_the_index(self):
+        player = Player.objects.create(
+            club=self.club, name='Émile', email='ÉMILE@Example.com')
+        user = User.objects.create_user('emile', 'ÉMILE@example.com')
+        player.refresh_from_db()
+        self.assertEqual(player.user, user)
+        again = Player.objects.create(
+            club=self.club, name='Émile 2', email='ÉMILE@EXAMPLE.com')
+        self.assertEqual(again.user, user)
+
+    def test_backfill_links_unlinked_players_in_batches(self):
+        Player.objects.bulk_create([
+            Player(club=self.club, name=f'Unlinked {n}',
+                   email=f'U{n}@example.com')
+            for n in range(5)])
+        first = User.objects.create_user('u1', 'u1@example.com')
+        User.objects.create_user('u1-again', 'U1@EXAMPLE.COM')
+        Player.objects.update(user=None)
+        out = StringIO()
+        call_command('link_players', batch_size=2, stdout=out)
+        # The captain plus the player whose email matches u1
+        self.assertIn('Linked 2 players', out.getvalue())
+        self.assertEqual(
+            Player.objects.get(name='Unlinked 1').user, first)
+        self.assertIsNone(Player.objects.get(name='Unlinked 0').user)
+
+
+class FeeLedgerTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+        self.add_players(10)
+        self.match.match_fee = Decimal('12.50')
+
+    def balances(self):
+        return dict(Player.objects.filter(
+            fee_balance__gt=0).values_list('name', 'fee_balance'))
+
+    def complete(self, match):
+        match.status = 'completed'
+        match.save()
+
+    def test_completing_a_match_charges_the_team_once(self):
+        self.complete(self.match)
+        self.assertEqual(self.balances(), {
+            'Player 001': Decimal('12.50'),
+            'Player 006': Decimal('12.50'),
+        })
+        # Saving again doesn't charge anyone twice
+        self.match.save()
+        self.assertEqual(FeeCharge.objects.count(), 2)
+
+    def test_changing_the_fee_after_completion_reprices_charges(self):
+        self.complete(self.match)
+        self.match.match_fee = Decimal('15.00')
+        self.match.save()
+        self.assertEqual(self.balances(), {
+            'Player 001': Decimal('15.00'),
+            'Player 006': Decimal('15.00'),
+        })
+        self.assertEqual(
+            set(FeeCharge.objects.values_list('amount', flat=True)),
+            {Decimal('15.00')})
+        self.match.match_fee = Decimal('0')
+        self.match.save()
+        self.assertEqual(self.balances(), {})
+        self.assertFalse(FeeCharge.objects.exists())
+
+    def test_team_changes_after_completion_reconcile_fees(self):
+        self.complete(self.match)
+        # Picked after the match was completed: charged straight away
+        MatchPlayer.objects.create(
+            match=self.match, player=self.captain, selected=True)
+        self.assertEqual(len(self.balances()), 3)
+
+        first, sixth = Player.objects.filter(
+            name__in=['Player 001', 'Player 006']).order_by('name')
+        apply_roster_action(self.match, [first.pk], 'remove_from_team')
+        self.assertNotIn('Player 001', self.balances())
+        MatchPlayer.objects.filter(player=sixth).delete()
+        self.match.save()
+        self.assertEqual(list(self.balances()), ['Captain'])
+        self.assertEqual(FeeCharge.objects.count(), 1)
+
+    def test_reopening_or_deleting_voids_charges(self):
+        second = Match.objects.create(
+            club=self.club, opposition=self.opposition,
+            date=date(2026, 6, 13))
+        MatchPlayer.objects.create(
+            match=second, player=self.captain, selected=True)
+        self.complete(self.match)
+        self.complete(second)
+        # Falls back to the club default fee
+        self.assertEqual(
+            self.balances()['Captain'], self.club.default_match_fee)
+
+        self.match.status = 'cancelled'
+        self.match.save()
+        self.assertEqual(list(self.balances()), ['Captain'])
+        second.delete()
+        self.assertEqual(self.balances(), {})
+        self.assertFalse(FeeCharge.objects.exists())
+
+    def test_payments_and_stale_saves(self):
+        self.complete(self.match)
+        player = Player.objects.get(name='Player 001')
+        record_payment(player, Decimal('10.00'), self.user, 'Cash')
+        # Saving a stale instance keeps the balance
+        player.phone = '07700'
+        player.save()
+        player.refresh_from_db()
+        self.assertEqual(player.fee_balance, Decimal('2.50'))
+
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('payment_create', args=[player.pk]), {'amount': '2.50'})
+        self.assertRedirects(response, reverse('fee_list'))
+        self.assertNotIn('Player 001', self.balances())
+        self.assertEqual(player.fee_payments.count(), 2)
+
+    def test_fee_list_query_count_is_constant(self):
+        self.client.force_login(self.user)
+        self.complete(self.match)
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get(reverse('fee_list'))
+        self.assertContains(response, 'Player 006')
+        self.add_players(30)
+        self.match.save()
+        with CaptureQueriesContext(connection) as large:
+            self.client.get(reverse('fee_list'))
+        self.assertEqual(
+            len(small.captured_queries), len(large.captured_queries))
+
+    def test_recount_command_repairs_drift(self):
+        self.complete(self.match)
+        Player.objects.update(fee_balance=Decimal('99.00'))
+        out = StringIO()
+        call_command('recount_fees', stdout=out)
+        self.assertIn('Repaired 11 of 11 players', out.getvalue())
+        self.assertEqual(len(self.balances()), 2)
+
+
+class SeasonStatsTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+        self.add_players(8)
+
+    def stats(self, name, season=2026):
+        return PlayerSeasonStats.objects.get(
+            player__name=name, season=season)
+
+    def test_stats_follow_responses_and_results(self):
+        Match.objects.create(
+            club=self.club, opposition=self.opposition,
+            date=date(2026, 6, 13))
+        stats = self.stats('Player 001')
+        self.assertEqual(
+            (stats.matches, stats.available, stats.selections,
+             stats.appearances), (2, 1, 1, 0))
+        self.assertEqual(stats.availability_rate, 50)
+
+        self.match.status = 'completed'
+        self.match.save()
+        stats = self.stats('Player 001')
+        self.assertEqual(stats.appearances, 1)
+        self.assertEqual(stats.fees_charged, self.club.default_match_fee)
+
+        # Bulk roster actions refresh the players they touch
+        apply_roster_action(self.match, [self.captain.pk], 'add_to_team')
+        self.assertEqual(self.stats('Captain').selections, 1)
+
+        # Moving a match to another season refreshes both
+        self.match.date = date(2025, 6, 6)
+        self.match.save()
+        self.assertEqual(self.stats('Player 001').matches, 1)
+        self.assertEqual(self.stats('Player 001', 2025).appearances, 1)
+
+        self.match.delete()
+        self.assertEqual(self.stats('Player 001', 2025).matches, 0)
+
+    def test_deleting_players_and_clubs(self):
+        Player.objects.get(name='Player 001').delete()
+        self.assertFalse(PlayerSeasonStats.objects.filter(
+            player__name='Player 001').exists())
+        self.club.delete()
+        self.assertFalse(PlayerSeasonStats.objects.exists())
+
+    def test_rebuild_command_and_page(self):
+        PlayerSeasonStats.objects.update(appearances=9)
+        PlayerSeasonStats.objects.filter(player=self.captain).delete()
+        out = StringIO()
+        call_command('rebuild_season_stats', stdout=out)
+        self.assertIn('Rebuilt 1 club seasons', out.getvalue())
+        self.assertEqual(self.stats('Player 001').appearances, 0)
+        self.assertEqual(self.stats('Captain').matches, 1)
+
+        self.client.force_login(self.user)
+        url = reverse('season_stats') + '?season=2026'
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertContains(response, 'Player 008')
+        # Players with no row yet are listed with zeros
+        Player.objects.create(club=self.club, name='Newcomer')
+        response = self.client.get(url)
+        self.assertContains(response, 'Newcomer')
+        self.assertFalse(PlayerSeasonStats.objects.filter(
+            player__name='Newcomer').exists())
+        stats_queries = [
+            q for q in context.captured_queries
+            if 'clubs_matchplayer' in q['sql'] or 'clubs_match"' in q['sql']]
+        self.assertEqual(stats_queries, [])
+
+
+class TeamSuggestionTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+        self.squad = [
+            Player.objects.create(club=self.club, name=name)
+            for name in ['Ann', 'Bob', 'Cat', 'Dan', 'Eve']]
+        self.earlier = Match.objects.create(
+            club=self.club, opposition=self.opposition,
+            date=date(2026, 5, 30), status='completed')
+
+    def respond(self, match, player, availability='yes', selected=False):
+        MatchPlayer.objects.create(
+            match=match, player=player, availability=availability,
+            selected=selected)
+
+    def test_favours_players_left_out(self):
+        ann, bob, cat, dan, eve = self.squad
+        # Ann and Bob played last time; Cat was available but left out
+        self.respond(self.earlier, ann, selected=True)
+        self.respond(self.earlier, bob, selected=True)
+        self.respond(self.earlier, cat)
+        for player in self.squad:
+            self.respond(self.match, player)
+        self.respond(self.match, self.captain, 'maybe')
+
+        picks = suggest_team(self.match, size=3)
+        # The only leader is a maybe, but the side needs one
+        self.assertEqual(picks, [cat, dan, self.captain])
+        self.assertEqual((picks[0].left_out, picks[0].appearances), (1, 0))
+
+    def test_selected_players_keep_their_places(self):
+        ann, bob, cat, dan, eve = self.squad
+        self.respond(self.match, self.captain, selected=True)
+        self.respond(self.match, ann, selected=True)
+        self.respond(self.match, bob, 'no')
+        self.respond(self.match, cat, 'maybe')
+        self.respond(self.match, dan)
+        self.assertEqual(suggest_team(self.match, size=4), [dan, cat])
+
+    def test_query_count_and_view(self):
+        for player in self.squad:
+            self.respond(self.match, player)
+            self.respond(self.earlier, player, selected=True)
+        with self.assertNumQueries(2):
+            suggest_team(self.match)
+
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse('team_selection', args=[self.match.pk]),
+            {'suggest': 1})
+        self.assertEqual(response.context['suggested_ids'], [
+            player.pk for player in self.squad])
+        self.assertContains(response, '5 player(s) suggested')
+
+
+class SeedLoadTests(TestCase):
+
+    def test_seed_load_creates_requested_volume(self):
+        call_command(
+            'seed_load', users=5, clubs=3, players=12, oppositions=2,
+            matches=4, club_batch=2, batch_size=10, stdout=StringIO())
+        self.assertEqual(Club.objects.count(), 3)
+        self.assertEqual(Player.objects.count(), 36)
+        self.assertEqual(Match.objects.count(), 12)
+        self.assertTrue(MatchPlayer.objects.exists())
+        # Counters are filled even though signals were skipped
+        out = StringIO()
+        call_command('recount_matches', stdout=out)
+        self.assertIn('Repaired 0 of 12 matches', out.getvalue())
+
+
+class QueryProfilingTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+
+    @override_settings(SQL_PROFILING=True, SQL_PROFILING_SLOW_MS=0)
+    def test_profiled_request_logs_queries_and_timing(self):
+        client = Client()
+        client.force_login(self.user)
+        with self.assertLogs('mfm_p4.sql') as logs:
+            response = client.get(reverse('match_list'))
+        self.assertTrue(response['Server-Timing'].startswith('sql;dur='))
+        summary = json.loads(logs.records[0].getMessage())
+        self.assertEqual(summary['view'], 'match_list')
+        self.assertGreater(summary['queries'], 0)
+        # Every query is over a 0ms threshold, so each is logged as slow
+        slow = [r for r in logs.records if r.levelname == 'WARNING']
+        self.assertEqual(len(slow), summary['queries'])
+
+    @override_settings(SQL_PROFILING=True, SQL_PROFILING_SLOW_MS=0)
+    async def test_async_view_queries_are_recorded_under_asgi(self):
+        client = AsyncClient()
+        await client.aforce_login(self.user)
+        with self.assertLogs('mfm_p4.sql') as logs:
+            response = await client.get(reverse('match_list'))
+        self.assertContains(response, 'Visitors CC')
+        summary = json.loads(logs.records[0].getMessage())
+        self.assertEqual(summary['view'], 'match_list')
+        # The view's own queries, not just the session and user lookups
+        slow = [json.loads(r.getMessage())['sql'] for r in logs.records[1:]]
+        self.assertTrue(any('"clubs_match"' in sql for sql in slow))
+
+    def test_profiling_is_off_by_default(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('match_list'))
+        self.assertNotIn('Server-Timing', response)
+
+
+class FragmentCacheTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+        fragment_cache().clear()
+        self.client.force_login(self.user)
+
+    def test_match_card_cached_until_roster_changes(self):
+        url = reverse('match_list')
+        self.client.get(url)
+        self.assertEqual(fragment_stats()['misses'], 1)
+        response = self.client.get(url)
+        self.assertEqual(fragment_stats()['hits'], 1)
+        self.assertContains(response, 'Not Set')
+
+        MatchPlayer.objects.create(
+            match=self.match, player=self.captain, availability='yes')
+        response = self.client.get(url)
+        self.assertEqual(fragment_stats()['misses'], 2)
+        self.assertContains(response, 'Available (1)')
+
+    def test_cached_roster_is_not_loaded(self):
+        self.add_players(4)
+        url = reverse('match_detail', args=[self.match.pk])
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(url)
+        with CaptureQueriesContext(connection) as warm:
+            response = self.client.get(url)
+        self.assertContains(response, 'Player 002')
+        self.assertLess(
+            len(warm.captured_queries), len(cold.captured_queries))
+        self.assertFalse(any(
+            'clubs_matchplayer' in q['sql'] for q in warm.captured_queries))
+
+    def test_opposition_rename_invalidates_cards(self):
+        url = reverse('match_detail', args=[self.match.pk])
+        self.client.get(url)
+        self.opposition.name = 'Renamed CC'
+        self.opposition.save()
+        self.assertContains(self.client.get(url), 'Renamed CC')
+
+    def test_stats_view_is_staff_only(self):
+        url = reverse('fragment_cache_stats')
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(
+            self.client.get(url).json(),
+            {'hits': 0, 'misses': 0, 'hit_rate': None})
+
+
+class MatchDetailTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+        self.client.force_login(self.user)
+
+    def test_match_detail_buckets(self):
+        self.add_players(8)
+        detail = build_match_detail(self.match)
+        self.assertEqual(
+            [mp.player.name for mp in detail['selected']],
+            ['Player 001', 'Player 006'])
+        self.assertEqual(len(detail['available']), 1)
+        self.assertEqual(len(detail['maybe']), 1)
+        self.assertEqual(len(detail['unavailable']), 2)
+        self.assertEqual(len(detail['not_responded']), 3)
+
+    def test_match_detail_uses_fixed_query_count(self):
+        url = reverse('match_detail', args=[self.match.pk])
+        counts = []
+        for size in [4, 40]:
+            self.add_players(size)
+            # Render from scratch, not from the fragment cache
+            fragment_cache().clear()
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertContains(response, 'Player 001')
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+
+class ConditionalGetTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+        self.add_players(10)
+        self.client.force_login(self.user)
+
+    def test_unchanged_pages_return_304(self):
+        for url in [reverse('match_list'), reverse('my_availability'),
+                    reverse('match_detail', args=[self.match.pk])]:
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+            with CaptureQueriesContext(connection) as context:
+                second = self.client.get(
+                    url, headers={'if-none-match': first['ETag']})
+            self.assertEqual(second.status_code, 304, url)
+            self.assertFalse(any(
+                'clubs_matchplayer' in q['sql']
+                for q in context.captured_queries))
+
+    def test_post_ignores_preconditions(self):
+        # A stale If-Match must not refuse (412) or skip the update
+        url = reverse('my_availability')
+        response = self.client.post(
+            url, {'matches': [self.match.pk], 'availability': 'no'},
+            headers={'if-match': '"stale"',
+                     'if-unmodified-since': 'Mon, 01 Jan 2001 00:00:00 GMT'})
+        self.assertRedirects(response, url, fetch_redirect_response=False)
+        entry = self.match.match_players.get(player=self.captain)
+        self.assertEqual(entry.availability, 'no')
+
+    def test_new_login_invalidates_etag(self):
+        # A cached page's CSRF tokens don't survive logging in again
+        url = reverse('my_availability')
+        etag = self.client.get(url)['ETag']
+        self.client.logout()
+        self.client.force_login(self.user)
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_roster_change_invalidates_etag(self):
+        url = reverse('match_detail', args=[self.match.pk])
+        etag = self.client.get(url)['ETag']
+        player = self.club.players.get(name='Player 003')
+        player.match_appearances.all().delete()
+        response = self.client.get(url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_bulk_action_invalidates_last_modified(self):
+        url = reverse('match_list')
+        last_modified = self.client.get(url)['Last-Modified']
+        apply_roster_action(
+            self.match, [self.captain.pk], 'set_available')
+        self.match.refresh_from_db()
+        self.assertGreater(
+            self.match.updated_at.timestamp(),
+            parse_http_date(last_modified))
+
+
+class ApiTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+        self.client.force_login(self.user)
+
+    def test_match_list_cursor_pagination(self):
+        for day in range(1, 6):
+            Match.objects.create(
+                club=self.club, opposition=self.opposition,
+                date=date(2026, 5, day))
+        url = reverse('api_match_list')
+        seen = []
+        params = {'limit': 2, 'fields': 'id,date,opposition_name'}
+        while True:
+            data = self.client.get(url, params).json()
+            seen.extend(data['results'])
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(
+            set(seen[0]), {'id', 'date', 'opposition_name'})
+        self.assertEqual(
+            [row['date'] for row in seen],
+            sorted(row['date'] for row in seen))
+
+    def test_list_query_count_independent_of_page_size(self):
+        self.add_players(30)
+        url = reverse('api_player_list')
+        counts = []
+        for limit in [2, 30]:
+            with CaptureQueriesContext(connection) as context:
+                data = self.client.get(url, {'limit': limit}).json()
+            self.assertEqual(len(data['results']), limit)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_match_roster(self):
+        self.add_players(4)
+        url = reverse('api_match_roster', args=[self.match.pk])
+        data = self.client.get(url, {'fields': 'name,availability'}).json()
+        self.assertEqual(len(data['results']), 5)
+        self.assertEqual(
+            data['results'][1], {'name': 'Player 001', 'availability': 'yes'})
+
+    def test_forged_cursors_are_rejected(self):
+        for forged in [['notadate', 1], [{'a': 1}, 1], ['2026-05-01', 'x'],
+                       ['2026-05-01', 1.5], 'junk']:
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(forged).encode()).decode()
+            response = self.client.get(
+                reverse('api_match_list'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, forged)
+            self.assertEqual(response.json()['error'], 'Invalid cursor.')
+
+    def test_errors_are_json(self):
+        response = self.client.get(
+            reverse('api_match_list'), {'fields': 'id,bogus'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('bogus', response.json()['error'])
+        other_club = Club.objects.create(name='Other', created_by=self.user)
+        other_match = Match.objects.create(
+            club=other_club, opposition=self.opposition,
+            date=date(2026, 6, 6))
+        response = self.client.get(
+            reverse('api_match_roster', args=[other_match.pk]))
+        self.assertEqual(response.status_code, 404)
+        self.client.logout()
+        response = self.client.get(reverse('api_player_list'))
+        self.assertEqual(response.status_code, 401)
+
+    def post_batch(self, items):
+        return self.client.post(
+            reverse('api_availability_batch'),
+            data=json.dumps({'items': items}),
+            content_type='application/json')
+
+    def test_availability_batch(self):
+        self.add_players(3)
+        players = list(
+            self.club.players.exclude(pk=self.captain.pk).order_by('name'))
+        other_club = Club.objects.create(name='Other', created_by=self.user)
+        stranger = Player.objects.create(club=other_club, name='Stranger')
+        items = [
+            {'match': self.match.pk, 'player': players[0].pk,
+             'availability': 'no'},
+            {'match': self.match.pk, 'player': players[2].pk,
+             'availability': 'yes', 'selected': True},
+            {'match': self.match.pk, 'player': stranger.pk,
+             'availability': 'yes'},
+            {'match': self.match.pk, 'player': players[1].pk,
+             'availability': 'perhaps'},
+            {'match': 999, 'player': players[1].pk, 'selected': True},
+        ]
+        with CaptureQueriesContext(connection) as context:
+            response = self.post_batch(items)
+        self.assertEqual(response.status_code, 200)
+        # Two groups of update fields, but one counter refresh
+        self.assertEqual(len([
+            q for q in context.captured_queries
+            if q['sql'].startswith('UPDATE "clubs_match"')]), 1)
+        data = response.json()
+        self.assertEqual(data['updated'], 2)
+        self.assertEqual(
+            [result['ok'] for result in data['results']],
+            [True, True, False, False, False])
+
+        rows = {
+            mp.player_id: mp for mp in MatchPlayer.objects.filter(
+                match=self.match)}
+        # Selection untouched where only availability was sent
+        self.assertEqual(rows[players[0].pk].availability, 'no')
+        self.assertTrue(rows[players[0].pk].selected)
+        self.assertTrue(rows[players[2].pk].selected)
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.unavailable_count, 0)
+
+    def test_availability_batch_permissions(self):
+        self.add_players(3)
+        players = list(
+            self.club.players.exclude(pk=self.captain.pk).order_by('name'))
+        member = User.objects.create_user('member', 'm@example.com', 'pw')
+        players[0].user = member
+        players[0].save()
+        self.client.force_login(member)
+        data = self.post_batch([
+            {'match': self.match.pk, 'player': players[0].pk,
+             'availability': 'maybe'},
+            {'match': self.match.pk, 'player': players[0].pk,
+             'selected': False},
+            {'match': self.match.pk, 'player': players[2].pk,
+             'availability': 'maybe'},
+        ]).json()
+        self.assertEqual(
+            [result['ok'] for result in data['results']],
+            [True, False, False])
+        self.assertEqual(
+            MatchPlayer.objects.get(
+                match=self.match, player=players[2]).availability,
+            'no')
+
+    def test_availability_batch_query_count_is_constant(self):
+        self.add_players(30)
+        players = list(
+            self.club.players.exclude(pk=self.captain.pk).order_by('name'))
+        counts = []
+        for size in [2, 30]:
+            items = [
+                {'match': self.match.pk, 'player': player.pk,
+                 'availability': 'yes'}
+                for player in players[:size]]
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.post_batch(items).status_code, 200)
+            counts.append(len(context.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_availability_batch_rejects_bad_bodies(self):
+        url = reverse('api_availability_batch')
+        response = self.client.post(
+            url, data='not json', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post_batch('items').status_code, 400)
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+
+class ExportTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+        self.url = reverse('availability_export', args=[self.club.pk])
+        self.client.force_login(self.user)
+
+    def export(self, **params):
+        response = self.client.get(self.url, {'season': 2026, **params})
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        content = b''.join(response.streaming_content).decode()
+        return list(csv.reader(StringIO(content)))
+
+    def test_season_matrix(self):
+        self.add_players(4)
+        second = Match.objects.create(
+            club=self.club, opposition=self.opposition,
+            date=date(2026, 6, 13))
+        MatchPlayer.objects.create(
+            match=second, player=self.captain, availability='no')
+        Match.objects.create(
+            club=self.club, opposition=self.opposition,
+            date=date(2025, 6, 14))
+        retired = Player.objects.get(name='Player 003')
+        retired.is_active = False
+        retired.save()
+        Player.objects.create(club=self.club, name='Gone', is_active=False)
+
+        rows = self.export()
+        self.assertEqual(rows[0], [
+            'Player', '06/06 vs Visitors CC', '13/06 vs Visitors CC'])
+        self.assertEqual(rows[1:], [
+            ['Captain', '', 'Unavailable'],
+            ['Player 001', 'Selected', ''],
+            ['Player 002', 'Maybe', ''],
+            # Inactive, but responded this season
+            ['Player 003', 'Unavailable', ''],
+            ['Player 004', '', ''],
+        ])
+
+    def test_query_count_independent_of_size(self):
+        self.add_players(4)
+        with CaptureQueriesContext(connection) as small:
+            self.export()
+        self.add_players(40)
+        with CaptureQueriesContext(connection) as large:
+            rows = self.export()
+        self.assertEqual(len(rows), 46)
+        self.assertEqual(
+            len(small.captured_queries), len(large.captured_queries))
+
+    def test_admin_or_captain_only(self):
+        self.captain.role = 'player'
+        self.captain.save()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    async def test_streams_asynchronously_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(self.url, {'season': 2026})
+        # A sync iterator would be read into memory in full by ASGI
+        self.assertTrue(response.is_async)
+        content = b''.join([line async for line in response])
+        rows = list(csv.reader(StringIO(content.decode())))
+        self.assertEqual(rows[0], ['Player', '06/06 vs Visitors CC'])
+        self.assertEqual(rows[1], ['Captain', ''])
+
+    def test_out_of_range_season_falls_back_to_this_year(self):
+        this_year = timezone.now().year
+        for season in ['-5', '0', '99999999999', 'abc']:
+            response = self.client.get(self.url, {'season': season})
+            self.assertIn(f'-{this_year}.csv', response['Content-Disposition'])
+            # Rows are only queried as the response is streamed
+            self.assertTrue(b''.join(response.streaming_content))
+
+
+class PlayerImportTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+
+    def test_import_validates_creates_and_links(self):
+        member = User.objects.create_user(
+            'member', 'Member@Example.com', 'password')
+        rows = parse_player_csv([
+            'Name,Email,Phone,Role,Notes',
+            'New Player,member@example.com,07700,,x',
+            'Second,second@example.com,,captain,',
+            ',nameless@example.com,,,',
+            'Dupe,CAPTAIN@example.com,,,',
+            'Repeat,second@example.com,,,',
+            'Bad Role,,,umpire,',
+        ])
+        created, errors = import_players(self.club, rows)
+
+        self.assertEqual(created, 2)
+        self.assertEqual([row for row, message in errors], [4, 5, 6, 7])
+        new = Player.objects.get(name='New Player')
+        self.assertEqual(new.user, member)
+        self.assertEqual(new.role, 'player')
+        self.assertEqual(Player.objects.get(name='Second').role, 'captain')
+        # Signals were skipped, but the awaiting counter still moves
+        self.match.refresh_from_db()
+        self.assertEqual(self.match.awaiting_count, 3)
+
+    def test_import_query_count_is_constant(self):
+        def rows(count, start):
+            return [
+                {'name': f'Imported {n}', 'email': f'i{n}@example.com'}
+                for n in range(start, start + count)]
+
+        with CaptureQueriesContext(connection) as small:
+            import_players(self.club, rows(3, 0))
+        with CaptureQueriesContext(connection) as large:
+            import_players(self.club, rows(300, 3))
+        self.assertEqual(
+            len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(self.club.players.count(), 304)
+
+    def test_missing_name_column(self):
+        with self.assertRaises(ValueError):
+            parse_player_csv(['email', 'a@example.com'])
+
+    def test_upload_view_and_command(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile(
+            'players.csv', b'\xef\xbb\xbfname,email\nViewed,v@example.com\n')
+        response = self.client.post(
+            reverse('player_import', args=[self.club.pk]), {'file': upload})
+        self.assertRedirects(response, reverse('player_list'))
+        self.assertTrue(Player.objects.filter(name='Viewed').exists())
+
+        with NamedTemporaryFile('w', suffix='.csv') as csv_file:
+            csv_file.write('name\nCommanded\n\n')
+            csv_file.flush()
+            out = StringIO()
+            call_command(
+                'import_players', self.club.pk, csv_file.name, stdout=out)
+        self.assertIn('Imported 1 of 1 players', out.getvalue())
+
+
+class FixtureSeriesTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+        self.add_players(3)
+        self.away_side = Opposition.objects.create(
+            club=self.club, name='Away CC', home_ground='Their Park')
+
+    def test_series_cycles_oppositions_and_alternates_venues(self):
+        matches = create_fixture_series(
+            self.club, date(2026, 5, 2), date(2026, 5, 30),
+            [self.opposition, self.away_side], every_weeks=2)
+
+        self.assertEqual(
+            [match.date for match in matches],
+            [date(2026, 5, 2), date(2026, 5, 16), date(2026, 5, 30)])
+        self.assertEqual(
+            [(m.opposition, m.is_home, m.venue) for m in matches], [
+                (self.opposition, True, 'The Oval'),
+                (self.away_side, False, 'Their Park'),
+                (self.opposition, True, 'The Oval'),
+            ])
+        saved = Match.objects.get(pk=matches[1].pk)
+        self.assertEqual(saved.match_fee, self.club.default_match_fee)
+        # Skipped signals are made up for: counters and season stats
+        self.assertEqual(saved.awaiting_count, 4)
+        self.assertEqual(
+            PlayerSeasonStats.objects.get(
+                player=self.captain, season=2026).matches, 4)
+
+    def test_query_count_is_constant(self):
+        with CaptureQueriesContext(connection) as small:
+            create_fixture_series(
+                self.club, date(2027, 4, 3), date(2027, 4, 10),
+                [self.opposition])
+        with CaptureQueriesContext(connection) as large:
+            create_fixture_series(
+                self.club, date(2028, 4, 1), date(2028, 9, 30),
+                [self.opposition, self.away_side], first_is_home=False)
+        self.assertEqual(
+            len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(Match.objects.filter(date__year=2028).count(), 27)
+
+    def test_view_creates_series_and_caps_length(self):
+        self.client.force_login(self.user)
+        url = reverse('match_series_create', args=[self.club.pk])
+        data = {
+            'first_date': '2026-07-04', 'last_date': '2026-07-25',
+            'every_weeks': 1, 'oppositions': [self.away_side.pk],
+            'first_is_home': 'False', 'time': '13:30', 'match_fee': '8.00',
+        }
+        response = self.client.post(url, data)
+        self.assertRedirects(response, reverse('match_list'))
+        self.assertEqual(
+            list(Match.objects.filter(date__month=7).values_list(
+                'is_home', flat=True)), [False, True, False, True])
+
+        data['last_date'] = '2028-07-25'
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Match.objects.filter(date__month=7).count(), 4)
+
+
+@task
+def failing_task(message):
+    raise ValueError(message)
+
+
+class JobQueueTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+        self.add_players(4)
+        Player.objects.filter(name__startswith='Player').update(
+            email='squad@example.com')
+
+    def test_view_queues_emails_for_the_worker(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('request_availability', args=[self.match.pk]))
+        self.assertRedirects(
+            response, reverse('team_selection', args=[self.match.pk]))
+        job = Job.objects.get()
+        self.assertEqual(job.name, 'send_availability_requests')
+        # Nothing is sent until the worker runs the job
+        self.assertEqual(len(mail.outbox), 0)
+
+        call_command(
+            'run_jobs', burst=True, concurrency=1, stdout=StringIO())
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        # The captain and the one squad player yet to respond
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['captain@example.com', 'squad@example.com'])
+        self.assertIn('/my-availability/', mail.outbox[0].body)
+        # One job per recipient, so a retry only re-sends its own email
+        self.assertEqual(
+            Job.objects.filter(
+                name='send_availability_request', status='done').count(),
+            2)
+
+        # Players who responded in the meantime aren't emailed
+        enqueue('send_availability_request', self.match.pk,
+                self.captain.pk, 'http://testserver/my-availability/')
+        MatchPlayer.objects.create(
+            match=self.match, player=self.captain, availability='yes')
+        call_command(
+            'run_jobs', burst=True, concurrency=1, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_failed_job_is_retried_then_given_up(self):
+        job = enqueue(failing_task, 'boom')
+        [claimed] = claim_jobs('test')
+        with self.assertLogs('clubs.jobs', 'ERROR'):
+            self.assertFalse(run_job(claimed))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('ValueError: boom', job.last_error)
+        # Backed off, so not due yet
+        self.assertEqual(claim_jobs('test'), [])
+
+        Job.objects.filter(pk=job.pk).update(
+            run_at=job.created_at, attempts=job.max_attempts - 1)
+        [claimed] = claim_jobs('test')
+        with self.assertLogs('clubs.jobs', 'ERROR'):
+            self.assertFalse(run_job(claimed))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+
+    def test_claims_are_exclusive_and_stale_locks_released(self):
+        first = enqueue('rebuild_club_season_stats', self.club.pk)
+        second = enqueue('rebuild_club_season_stats', self.club.pk)
+        self.assertEqual(claim_jobs('one'), [first])
+        self.assertEqual(claim_jobs('two', limit=5), [second])
+        self.assertEqual(claim_jobs('three'), [])
+
+        self.assertEqual(requeue_stale_jobs(timeout=60), 0)
+        self.assertEqual(requeue_stale_jobs(timeout=-1), 2)
+        self.assertEqual(len(claim_jobs('three', limit=5)), 2)
+
+    def test_enqueue_is_transactional_and_checks_the_task(self):
+        with self.assertRaises(ValueError):
+            enqueue('no_such_task')
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                enqueue('rebuild_club_season_stats', self.club.pk)
+                raise RuntimeError
+        self.assertFalse(Job.objects.exists())
+
+
+class LiveRosterTests(ClubDataMixin, TestCase):
+
+    def setUp(self):
+        self.make_club()
+        self.url = reverse('roster_stream', args=[self.match.pk])
+
+    async def test_stream_forwards_published_events(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        self.assertEqual(await anext(content), b'retry: 3000\n\n')
+        self.assertEqual(broker.subscriber_count(self.match.pk), 1)
+
+        broker.publish(self.match.pk, {
+            'type': 'roster', 'match': self.match.pk,
+            'players': [{'id': self.captain.pk, 'availability': 'no'}]})
+        message = await asyncio.wait_for(anext(content), 1)
+        event, data = message.decode().strip().split('\n')
+        self.assertEqual(event, 'event: roster')
+        self.assertEqual(
+            json.loads(data.removeprefix('data: '))['players'][0],
+            {'id': self.captain.pk, 'availability': 'no'})
+
+        await content.aclose()
+
+    async def test_closed_stream_unsubscribes(self):
+        events = roster_events(self.match.pk)
+        await anext(events)
+        self.assertEqual(broker.subscriber_count(self.match.pk), 1)
+        await events.aclose()
+        self.assertEqual(broker.subscriber_count(self.match.pk), 0)
+
+    def test_writes_publish_deltas_on_commit(self):
+        self.add_players(2)
+        players = list(
+            self.club.players.exclude(pk=self.captain.pk).order_by('name'))
+        published = []
+        with self.captureOnCommitCallbacks() as callbacks:
+            apply_roster_action(
+                self.match, [self.captain.pk] + [p.pk for p in players],
+                'add_to_team')
+            MatchPlayer.objects.filter(player=players[1]).delete()
+        # Nothing is sent until the transaction commits
+        self.assertEqual(len(callbacks), 2)
+
+        original = broker.publish
+        broker.publish = lambda match_id, event: published.append(event)
+        try:
+            for callback in callbacks:
+                callback()
+        finally:
+            broker.publish = original
+        # New rows are sent whole, existing ones just what changed
+        self.assertEqual(published[0]['players'], [
+            {'id': self.captain.pk, 'availability': 'yes', 'selected': True},
+            {'id': players[0].pk, 'selected': True},
+            {'id': players[1].pk, 'selected': True},
+        ])
+        self.assertEqual(published[1]['players'], [
+            {'id': players[1].pk, 'availability': None, 'selected': False},
+        ])
+
+    def test_access(self):
+        # Under WSGI the stream declines rather than tying up a worker
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 204)
+        outsider = User.objects.create_user('outsider', 'o@example.com')
+        self.client.force_login(outsider)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+
+class AsyncViewTests(ClubDataMixin, TestCase):
+    """The read-heavy pages are async views; drive them through ASGI"""
+
+    def setUp(self):
+        self.make_club()
+        self.add_players(6)
+
+    async def test_pages_render_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        pages = [
+            (reverse('match_list'), 'Visitors CC'),
+            (reverse('player_list'), 'Player 001'),
+            (reverse('match_detail', args=[self.match.pk]), 'Player 001'),
+        ]
+        for url, text in pages:
+            response = await self.async_client.get(url)
+            self.assertContains(response, text)
+
+    async def test_conditional_get_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse('match_detail', args=[self.match.pk])
+        etag = (await self.async_client.get(url))['ETag']
+        response = await self.async_client.get(
+            url, headers={'if-none-match': etag})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_login_required(self):
+        response = await self.async_client.get(reverse('match_list'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_membership_is_loaded_once(self):
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('match_list'))
+        self.assertEqual(response.status_code, 200)
+        membership_queries = [
+            q for q in context.captured_queries
+            if q['sql'].startswith('SELECT "clubs_player"')
+            and '"clubs_player"."user_id" =' in q['sql']]
+        self.assertEqual(len(membership_queries), 1)
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, exports, live, views
 
 urlpatterns = [
     # Homepage
@@ -7,15 +7,20 @@ urlpatterns = [
 
     # Club CRUD routes
     path('club/new/', views.club_create, name='club_create'),
+    path('club/switch/', views.switch_club, name='switch_club'),
     # pk = primary key (club id)
     path('club/<int:pk>/', views.club_detail, name='club_detail'),
     path('club/<int:pk>/edit/', views.club_update, name='club_update'),
     path('club/<int:pk>/delete/', views.club_delete, name='club_delete'),
+    path('club/<int:club_pk>/availability-export/',
+         exports.availability_export, name='availability_export'),
 
     # Player list and CRUD routes
     path('players/', views.player_list, name='player_list'),
     path('club/<int:club_pk>/player/new/',
          views.player_create, name='player_create'),
+    path('club/<int:club_pk>/player/import/',
+         views.player_import, name='player_import'),
     path('player/<int:pk>/edit/', views.player_update, name='player_update'),
     path('player/<int:pk>/delete/', views.player_delete, name='player_delete'),
 
@@ -31,6 +36,8 @@ urlpatterns = [
     path('matches/', views.match_list, name='match_list'),
     path('club/<int:club_pk>/match/new/',
          views.match_create, name='match_create'),
+    path('club/<int:club_pk>/match/series/',
+         views.match_series_create, name='match_series_create'),
     path('match/<int:pk>/', views.match_detail, name='match_detail'),
     path('match/<int:pk>/edit/', views.match_update, name='match_update'),
     path('match/<int:pk>/delete/', views.match_delete, name='match_delete'),
@@ -42,7 +49,12 @@ urlpatterns = [
     # Team selection
     path('match/<int:match_pk>/select/',
          views.team_selection, name='team_selection'),
+    path('match/<int:match_pk>/roster-stream/',
+         live.roster_stream, name='roster_stream'),
 
+    # Email players yet to respond (queued for the job worker)
+    path('match/<int:match_pk>/request-availability/',
+         views.request_availability, name='request_availability'),
     # Bulk availability update
     path('match/<int:match_pk>/bulk-availability/',
          views.bulk_availability, name='bulk_availability'),
@@ -52,4 +64,24 @@ urlpatterns = [
     path('player/<int:player_pk>/availability/',
          views.player_availability, name='player_availability'),
 
+    # Season statistics
+    path('stats/', views.season_stats, name='season_stats'),
+
+    # Match fees
+    path('fees/', views.fee_list, name='fee_list'),
+    path('player/<int:player_pk>/payment/',
+         views.payment_create, name='payment_create'),
+
+    # Read-only JSON API
+    path('api/matches/', api.match_list, name='api_match_list'),
+    path('api/matches/<int:pk>/roster/',
+         api.match_roster, name='api_match_roster'),
+    path('api/players/', api.player_list, name='api_player_list'),
+    path('api/availability/', api.availability_batch,
+         name='api_availability_batch'),
+
+    # Fragment cache hit/miss counters (staff only)
+    path('cache-stats/', views.fragment_cache_stats,
+         name='fragment_cache_stats'),
+
 ]
@@ -1,17 +1,48 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import (
+    render, redirect, get_object_or_404, aget_object_or_404,
+)
 from django.contrib.auth.decorators import login_required
-from .models import Club, Player, Opposition, Match, MatchPlayer
-from .forms import ClubForm, PlayerForm, OppositionForm, MatchForm
+from .models import (
+    Club, Player, Opposition, Match, MatchPlayer, PlayerSeasonStats,
+)
+from .forms import (
+    ClubForm, PlayerForm, PlayerImportForm, OppositionForm, MatchForm,
+    FixtureSeriesForm, PaymentForm,
+)
+from .fees import record_payment
+from .jobs import enqueue
+from .conditional import club_matches_condition, match_condition
+from .fragments import aprefetch_fragment, fragment_stats
+from .middleware import ACTIVE_CLUB_SESSION_KEY
+from .selection import suggest_team
+from .tasks import send_availability_requests
+from .services import (
+    build_roster, abuild_match_detail, apply_roster_action,
+    apply_player_action, parse_player_csv, import_players, fill_venue,
+    create_fixture_series,
+)
 from django.core.exceptions import PermissionDenied
+from django.http import JsonResponse
 from django.contrib import messages
 from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+
+# Success message for each bulk roster action
+ROSTER_ACTION_MESSAGES = {
+    'set_available': 'set to Available.',
+    'set_maybe': 'set to Maybe.',
+    'set_unavailable': 'set to Unavailable.',
+    'add_to_team': 'added to team.',
+    'remove_from_team': 'removed from team.',
+}
 
 
 def home(request):
     """Display the homepage - redirect to club if user has one"""
     if request.user.is_authenticated:
         # Check if user has a club (as a player)
-        player = Player.objects.filter(user=request.user).first()
+        player = request.membership.player
         if player:
             return redirect('match_list')
     return render(request, 'clubs/home.html')
@@ -37,6 +68,8 @@ def club_create(request):
                 phone=request.POST.get('admin_phone', ''),
                 role='admin'
             )
+            # Work in the new club straight away
+            request.session[ACTIVE_CLUB_SESSION_KEY] = club.pk
             messages.success(request, 'Club created successfully.')
             return redirect('club_detail', pk=club.pk)
     else:
@@ -45,11 +78,25 @@ def club_create(request):
     return render(request, 'clubs/club_form.html', {'form': form})
 
 
+@login_required
+@require_POST
+def switch_club(request):
+    """Make another of the user's clubs the active one"""
+    try:
+        club_id = int(request.POST.get('club', ''))
+    except ValueError:
+        club_id = None
+    if request.membership.player_for(club_id) is None:
+        raise PermissionDenied
+    request.session[ACTIVE_CLUB_SESSION_KEY] = club_id
+    return redirect('match_list')
+
+
 @login_required
 def club_detail(request, pk):
     """View a single club's details"""
     club = get_object_or_404(Club, pk=pk)
-    is_admin_or_captain = club.is_admin_or_captain(request.user)
+    is_admin_or_captain = request.membership.is_admin_or_captain(club.pk)
     return render(request, 'clubs/club_detail.html', {
         'club': club,
         'is_admin_or_captain': is_admin_or_captain,
@@ -61,7 +108,7 @@ def club_update(request, pk):
     """Edit an existing club"""
     club = get_object_or_404(Club, pk=pk)
     # Permission check - only admin/captain can edit club
-    if not club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(club.pk):
         raise PermissionDenied
     if request.method == 'POST':
         # Form was submitted with changes
@@ -83,7 +130,7 @@ def club_delete(request, pk):
     """Delete a club - requires POST confirmation"""
     club = get_object_or_404(Club, pk=pk)
     # Permission check - only admin/captain can delete club
-    if not club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(club.pk):
         raise PermissionDenied
     if request.method == 'POST':
         club.delete()
@@ -96,7 +143,7 @@ def player_create(request, club_pk):
     """Create a new player for a specific club"""
     club = get_object_or_404(Club, pk=club_pk)
     # Permission check - only admin/captain can add players
-    if not club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(club.pk):
         raise PermissionDenied
     if request.method == 'POST':
         form = PlayerForm(request.POST)
@@ -114,12 +161,42 @@ def player_create(request, club_pk):
         request, 'clubs/player_form.html', {'form': form, 'club': club})
 
 
+@login_required
+def player_import(request, club_pk):
+    """Add many players to a club from an uploaded CSV file"""
+    club = get_object_or_404(Club, pk=club_pk)
+    # Permission check - only admin/captain can add players
+    if not request.membership.is_admin_or_captain(club.pk):
+        raise PermissionDenied
+    errors = []
+    if request.method == 'POST':
+        form = PlayerImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                text = form.cleaned_data['file'].read().decode('utf-8-sig')
+                rows = parse_player_csv(text.splitlines())
+            except (UnicodeDecodeError, ValueError) as error:
+                form.add_error('file', str(error))
+            else:
+                created, errors = import_players(club, rows)
+                messages.success(request, f'{created} player(s) imported.')
+                if not errors:
+                    return redirect('player_list')
+    else:
+        form = PlayerImportForm()
+    return render(request, 'clubs/player_import.html', {
+        'form': form,
+        'club': club,
+        'errors': errors,
+    })
+
+
 @login_required
 def player_update(request, pk):
     """Edit an existing player"""
     player = get_object_or_404(Player, pk=pk)
     # Permission check - only admin/captain can edit players
-    if not player.club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(player.club_id):
         raise PermissionDenied
     if request.method == 'POST':
         form = PlayerForm(request.POST, instance=player)
@@ -140,7 +217,7 @@ def player_delete(request, pk):
     """Delete a player - requires POST confirmation"""
     player = get_object_or_404(Player, pk=pk)
     # Permission check - only admin/captain can delete players
-    if not player.club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(player.club_id):
         raise PermissionDenied
     club_pk = player.club.pk
     if request.method == 'POST':
@@ -156,7 +233,7 @@ def opposition_create(request, club_pk):
     """Create a new opposition team for a specific club"""
     club = get_object_or_404(Club, pk=club_pk)
     # Permission check - only admin/captain can add opposition
-    if not club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(club.pk):
         raise PermissionDenied
     if request.method == 'POST':
         form = OppositionForm(request.POST)
@@ -179,7 +256,7 @@ def opposition_update(request, pk):
     """Edit an existing opposition team"""
     opposition = get_object_or_404(Opposition, pk=pk)
     # Permission check - only admin/captain can edit opposition
-    if not opposition.club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(opposition.club_id):
         raise PermissionDenied
     if request.method == 'POST':
         form = OppositionForm(request.POST, instance=opposition)
@@ -201,7 +278,7 @@ def opposition_delete(request, pk):
     """Delete an opposition team"""
     opposition = get_object_or_404(Opposition, pk=pk)
     # Permission check - only admin/captain can delete opposition
-    if not opposition.club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(opposition.club_id):
         raise PermissionDenied
     club_pk = opposition.club.pk
     if request.method == 'POST':
@@ -217,7 +294,7 @@ def match_create(request, club_pk):
     """Create a new match for a specific club"""
     club = get_object_or_404(Club, pk=club_pk)
     # Permission check - only admin/captain can add matches
-    if not club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(club.pk):
         raise PermissionDenied
     if request.method == 'POST':
         form = MatchForm(request.POST)
@@ -225,11 +302,7 @@ def match_create(request, club_pk):
             new_match = form.save(commit=False)
             new_match.club = club
             # Auto-fill venue if empty
-            if not new_match.venue or not new_match.venue.strip():
-                if new_match.is_home:
-                    new_match.venue = club.home_ground
-                else:
-                    new_match.venue = new_match.opposition.home_ground
+            fill_venue(new_match, club)
             new_match.save()
             messages.success(request, 'Match created successfully.')
             return redirect('team_selection', match_pk=new_match.pk)
@@ -237,8 +310,8 @@ def match_create(request, club_pk):
         form = MatchForm(
             initial={'match_fee': club.default_match_fee, 'time': '13:00'})
         # Only show opposition teams for this club
-        form.fields['opposition'].queryset = Opposition.objects.filter(
-            club=club)
+        form.fields['opposition'].queryset = Opposition.objects.for_club(
+            club.pk)
     return render(request, 'clubs/match_form.html', {
         'form': form,
         'club': club
@@ -246,36 +319,82 @@ def match_create(request, club_pk):
 
 
 @login_required
-def match_detail(request, pk):
-    """View a single match's details"""
-    current_match = get_object_or_404(Match, pk=pk)
+def match_series_create(request, club_pk):
+    """Schedule a run of matches (e.g. every Saturday) in one go"""
+    club = get_object_or_404(Club, pk=club_pk)
+    # Permission check - only admin/captain can add matches
+    if not request.membership.is_admin_or_captain(club.pk):
+        raise PermissionDenied
+    if request.method == 'POST':
+        form = FixtureSeriesForm(request.POST, club=club)
+        if form.is_valid():
+            data = form.cleaned_data
+            matches = create_fixture_series(
+                club, data['first_date'], data['last_date'],
+                list(data['oppositions']),
+                every_weeks=data['every_weeks'],
+                first_is_home=data['first_is_home'],
+                time=data['time'],
+                match_fee=data['match_fee'],
+            )
+            messages.success(request, f'{len(matches)} matches scheduled.')
+            return redirect('match_list')
+    else:
+        form = FixtureSeriesForm(club=club, initial={
+            'match_fee': club.default_match_fee, 'time': '13:00'})
+    return render(request, 'clubs/match_series_form.html', {
+        'form': form,
+        'club': club
+    })
 
-    # Count selected and available
-    match_players = current_match.match_players.all()
-    selected_count = match_players.filter(selected=True).count()
-    available_count = match_players.filter(
-        availability='yes', selected=False).count()
 
-    # Warning: selected but not available
-    unavailable_selected = match_players.filter(
-        selected=True).exclude(availability='yes')
+@login_required
+@match_condition
+async def match_detail(request, pk):
+    """View a single match's details"""
+    membership = await request.amembership()
+    current_match = await aget_object_or_404(
+        Match.objects.select_related('club', 'opposition'), pk=pk)
 
     # Permission check
-    is_admin_or_captain = current_match.club.is_admin_or_captain(request.user)
+    is_admin_or_captain = membership.is_admin_or_captain(
+        current_match.club_id)
+
+    # The roster fragment varies by admin view and highlighted player;
+    # when it is cached the roster isn't loaded at all
+    viewer_pk = membership.player.pk if membership.player else None
+    prefetched = await aprefetch_fragment(
+        'detail_roster', current_match, [is_admin_or_captain, viewer_pk])
+    if prefetched:
+        detail = {
+            key: [] for key in ['selected', 'available', 'maybe',
+                                'unavailable', 'not_responded']}
+    else:
+        # Every roster list comes pre-sorted from two queries, so the
+        # template never goes back to the database
+        detail = await abuild_match_detail(current_match)
+
+    # Warning: selected but not available
+    unavailable_selected = [
+        mp for mp in detail['selected'] if mp.availability != 'yes']
 
-    # Players who haven't responded yet
-    responded_player_ids = match_players.values_list('player_id', flat=True)
-    not_responded = Player.objects.filter(
-        club=current_match.club, is_active=True
-    ).exclude(id__in=responded_player_ids)
+    # Maybe and unavailable share a card, still in name order
+    maybe_unavailable = sorted(
+        detail['maybe'] + detail['unavailable'],
+        key=lambda mp: mp.player.name)
 
     return render(request, 'clubs/match_detail.html', {
         'match': current_match,
-        'selected_count': selected_count,
-        'available_count': available_count,
+        'selected_players': detail['selected'],
+        'available_players': detail['available'],
+        'maybe_unavailable_players': maybe_unavailable,
+        'selected_count': len(detail['selected']),
+        'available_count': len(detail['available']),
         'unavailable_selected': unavailable_selected,
         'is_admin_or_captain': is_admin_or_captain,
-        'not_responded': not_responded,
+        'not_responded': detail['not_responded'],
+        'viewer_pk': viewer_pk,
+        'prefetched_fragments': prefetched,
     })
 
 
@@ -284,7 +403,7 @@ def match_update(request, pk):
     """Edit an existing match"""
     current_match = get_object_or_404(Match, pk=pk)
     # Permission check - only admin/captain can edit matches
-    if not current_match.club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(current_match.club_id):
         raise PermissionDenied
     if request.method == 'POST':
         form = MatchForm(request.POST, instance=current_match)
@@ -295,8 +414,8 @@ def match_update(request, pk):
     else:
         form = MatchForm(instance=current_match)
         # Only show opposition teams for this club
-        form.fields['opposition'].queryset = Opposition.objects.filter(
-            club=current_match.club)
+        form.fields['opposition'].queryset = Opposition.objects.for_club(
+            current_match.club_id)
     return render(request, 'clubs/match_form.html', {
         'form': form,
         'match': current_match,
@@ -309,7 +428,7 @@ def match_delete(request, pk):
     """Delete a match"""
     current_match = get_object_or_404(Match, pk=pk)
     # Permission check - only admin/captain can delete matches
-    if not current_match.club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(current_match.club_id):
         raise PermissionDenied
     club_pk = current_match.club.pk
     if request.method == 'POST':
@@ -324,8 +443,7 @@ def set_availability(request, match_pk, availability):
     """Set player's availability for a match"""
     current_match = get_object_or_404(Match, pk=match_pk)
     # Find player record for this user in this club
-    player = Player.objects.filter(
-        club=current_match.club, user=request.user).first()
+    player = request.membership.player_for(current_match.club_id)
     if not player:
         raise PermissionDenied
 
@@ -351,38 +469,32 @@ def team_selection(request, match_pk):
     """Captain selects players for the match"""
     current_match = get_object_or_404(Match, pk=match_pk)
     # Permission check - only admin/captain can select team
-    if not current_match.club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(current_match.club_id):
         raise PermissionDenied
 
-    # Get current user's player record
-    current_player = Player.objects.filter(user=request.user).first()
-
-    # Get all players and their availability for this match
-    players = Player.objects.filter(club=current_match.club, is_active=True)
-
-    # Split players into categories
-    selected_players = []
-    available_players = []
-    maybe_players = []
-    awaiting_players = []
-    unavailable_players = []
-
-    for player in players:
-        mp = current_match.match_players.filter(player=player).first()
-        player.is_selected = mp.selected if mp else False
-        player.availability = mp.availability if mp else None
-        player.is_current_user = (player == current_player)
-
-        if player.is_selected:
-            selected_players.append(player)
-        elif player.availability == 'yes':
-            available_players.append(player)
-        elif player.availability == 'maybe':
-            maybe_players.append(player)
-        elif player.availability is None:
-            awaiting_players.append(player)
-        else:
-            unavailable_players.append(player)
+    if request.method == 'POST':
+        action = request.POST.get('action')
+        selected_ids = request.POST.getlist('selected')
+        current_accordion = request.POST.get(
+            'current_accordion', 'selectedPlayers')
+
+        if action in ROSTER_ACTION_MESSAGES:
+            # One bulk upsert for all ticked players
+            updated = apply_roster_action(current_match, selected_ids, action)
+            messages.success(
+                request,
+                f'{updated} player(s) {ROSTER_ACTION_MESSAGES[action]}')
+            return redirect(
+                f"{reverse('team_selection', args=[match_pk])}"
+                f"?open={current_accordion}")
+
+    # Get all players and their availability for this match (one query)
+    roster = build_roster(current_match, request.user)
+    selected_players = roster['selected']
+    available_players = roster['available']
+    maybe_players = roster['maybe']
+    awaiting_players = roster['awaiting']
+    unavailable_players = roster['unavailable']
 
     # Sort selected players: available first, then maybe,
     # then awaiting, then unavailable
@@ -408,90 +520,17 @@ def team_selection(request, match_pk):
     unavailable_selected = [
         p for p in selected_players if p.availability != 'yes']
 
-    if request.method == 'POST':
-        action = request.POST.get('action')
-        selected_ids = request.POST.getlist('selected')
-        current_accordion = request.POST.get(
-            'current_accordion', 'selectedPlayers')
-
-        if action == 'set_available':
-            for player_id in selected_ids:
-                match_player, created = MatchPlayer.objects.get_or_create(
-                    match=current_match,
-                    player_id=player_id,
-                    defaults={'availability': 'yes'}
-                )
-                match_player.availability = 'yes'
-                match_player.save()
-            messages.success(
-                request, f'{len(selected_ids)} player(s) set to Available.')
-            return redirect(
-                f"{reverse('team_selection', args=[match_pk])}"
-                f"?open={current_accordion}")
-
-        elif action == 'set_maybe':
-            for player_id in selected_ids:
-                match_player, created = MatchPlayer.objects.get_or_create(
-                    match=current_match,
-                    player_id=player_id,
-                    defaults={'availability': 'maybe'}
-                )
-                match_player.availability = 'maybe'
-                match_player.save()
-            messages.success(
-                request, f'{len(selected_ids)} player(s) set to Maybe.')
-            return redirect(
-                f"{reverse('team_selection', args=[match_pk])}"
-                f"?open={current_accordion}")
-
-        elif action == 'set_unavailable':
-            for player_id in selected_ids:
-                match_player, created = MatchPlayer.objects.get_or_create(
-                    match=current_match,
-                    player_id=player_id,
-                    defaults={'availability': 'no'}
-                )
-                match_player.availability = 'no'
-                match_player.save()
-            messages.success(
-                request, f'{len(selected_ids)} player(s) set to Unavailable.')
-            return redirect(
-                f"{reverse('team_selection', args=[match_pk])}"
-                f"?open={current_accordion}")
-
-        elif action == 'add_to_team':
-            for player_id in selected_ids:
-                match_player, created = MatchPlayer.objects.get_or_create(
-                    match=current_match,
-                    player_id=player_id,
-                    defaults={'availability': 'yes'}
-                )
-                match_player.selected = True
-                match_player.save()
-            messages.success(
-                request, f'{len(selected_ids)} player(s) added to team.')
-            return redirect(
-                f"{reverse('team_selection', args=[match_pk])}"
-                f"?open={current_accordion}")
-
-        elif action == 'remove_from_team':
-            for player_id in selected_ids:
-                match_player, created = MatchPlayer.objects.get_or_create(
-                    match=current_match,
-                    player_id=player_id,
-                    defaults={'availability': 'yes'}
-                )
-                match_player.selected = False
-                match_player.save()
-            messages.success(
-                request, f'{len(selected_ids)} player(s) removed from team.')
-            return redirect(
-                f"{reverse('team_selection', args=[match_pk])}"
-                f"?open={current_accordion}")
-
     # Get which accordion to open from URL param
     open_accordion = request.GET.get('open', 'selectedPlayers')
 
+    # ?suggest=1 pre-ticks a fair pick to fill the team
+    suggested_ids = []
+    if request.GET.get('suggest'):
+        players = [p for bucket in roster.values() for p in bucket]
+        suggested_ids = [
+            p.pk for p in suggest_team(current_match, players)]
+        open_accordion = 'availablePlayers'
+
     # Count total available (selected + not selected but available)
     total_available = len(available_players) + len(
         [p for p in selected_players if p.availability == 'yes'])
@@ -506,138 +545,70 @@ def team_selection(request, match_pk):
         'unavailable_selected': unavailable_selected,
         'open_accordion': open_accordion,
         'total_available': total_available,
+        'suggested_ids': suggested_ids,
+        'suggesting': bool(request.GET.get('suggest')),
     })
 
 
+@login_required
+@require_POST
+def request_availability(request, match_pk):
+    """Email players yet to respond, in the background"""
+    current_match = get_object_or_404(Match, pk=match_pk)
+    # Permission check - only admin/captain can chase responses
+    if not request.membership.is_admin_or_captain(current_match.club_id):
+        raise PermissionDenied
+    enqueue(
+        send_availability_requests, current_match.pk,
+        request.build_absolute_uri(reverse('my_availability')))
+    messages.success(
+        request, 'Availability requests will be emailed shortly.')
+    return redirect('team_selection', match_pk=match_pk)
+
+
 @login_required
 def bulk_availability(request, match_pk):
     """View/manage availability for all players for a match"""
     current_match = get_object_or_404(Match, pk=match_pk)
 
     # Permission check - only admin/captain can manage availability
-    if not current_match.club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(current_match.club_id):
         raise PermissionDenied
 
-    # Get current user's player record
-    current_player = Player.objects.filter(user=request.user).first()
-
-    # Get all players and their availability for this match
-    players = Player.objects.filter(club=current_match.club, is_active=True)
-
-    # Split players into categories by availability only (not selection)
-    available_players = []
-    maybe_players = []
-    awaiting_players = []
-    unavailable_players = []
-    selected_count = 0
-
-    for player in players:
-        mp = current_match.match_players.filter(player=player).first()
-        player.is_selected = mp.selected if mp else False
-        player.availability = mp.availability if mp else None
-        player.is_current_user = (player == current_player)
-
-        if player.is_selected:
-            selected_count += 1
-
-        if player.availability == 'yes':
-            available_players.append(player)
-        elif player.availability == 'maybe':
-            maybe_players.append(player)
-        elif player.availability is None:
-            awaiting_players.append(player)
-        else:
-            unavailable_players.append(player)
-
-    # Sort each list: in-team first, then alphabetically
-    def in_team_sort_key(p):
-        return (0 if p.is_selected else 1, p.name.lower())
-
-    available_players.sort(key=in_team_sort_key)
-    maybe_players.sort(key=in_team_sort_key)
-    awaiting_players.sort(key=in_team_sort_key)
-    unavailable_players.sort(key=in_team_sort_key)
-
     if request.method == 'POST':
         action = request.POST.get('action')
         selected_ids = request.POST.getlist('selected')
         current_accordion = request.POST.get(
             'current_accordion', 'availablePlayers')
 
-        if action == 'set_available':
-            for player_id in selected_ids:
-                match_player, created = MatchPlayer.objects.get_or_create(
-                    match=current_match,
-                    player_id=player_id,
-                    defaults={'availability': 'yes'}
-                )
-                match_player.availability = 'yes'
-                match_player.save()
-            messages.success(
-                request, f'{len(selected_ids)} player(s) set to Available.')
-            return redirect(
-                f"{reverse('bulk_availability', args=[match_pk])}"
-                f"?open={current_accordion}")
-
-        elif action == 'set_maybe':
-            for player_id in selected_ids:
-                match_player, created = MatchPlayer.objects.get_or_create(
-                    match=current_match,
-                    player_id=player_id,
-                    defaults={'availability': 'maybe'}
-                )
-                match_player.availability = 'maybe'
-                match_player.save()
+        if action in ROSTER_ACTION_MESSAGES:
+            # One bulk upsert for all ticked players
+            updated = apply_roster_action(current_match, selected_ids, action)
             messages.success(
-                request, f'{len(selected_ids)} player(s) set to Maybe.')
+                request,
+                f'{updated} player(s) {ROSTER_ACTION_MESSAGES[action]}')
             return redirect(
                 f"{reverse('bulk_availability', args=[match_pk])}"
                 f"?open={current_accordion}")
 
-        elif action == 'set_unavailable':
-            for player_id in selected_ids:
-                match_player, created = MatchPlayer.objects.get_or_create(
-                    match=current_match,
-                    player_id=player_id,
-                    defaults={'availability': 'no'}
-                )
-                match_player.availability = 'no'
-                match_player.save()
-            messages.success(
-                request, f'{len(selected_ids)} player(s) set to Unavailable.')
-            return redirect(
-                f"{reverse('bulk_availability', args=[match_pk])}"
-                f"?open={current_accordion}")
+    # Get all players and their availability for this match (one query)
+    # Split players into categories by availability only (not selection)
+    roster = build_roster(current_match, request.user, split_selected=False)
+    available_players = roster['available']
+    maybe_players = roster['maybe']
+    awaiting_players = roster['awaiting']
+    unavailable_players = roster['unavailable']
+    selected_count = len([
+        p for bucket in roster.values() for p in bucket if p.is_selected])
 
-        elif action == 'add_to_team':
-            for player_id in selected_ids:
-                match_player, created = MatchPlayer.objects.get_or_create(
-                    match=current_match,
-                    player_id=player_id,
-                    defaults={'availability': 'yes'}
-                )
-                match_player.selected = True
-                match_player.save()
-            messages.success(
-                request, f'{len(selected_ids)} player(s) added to team.')
-            return redirect(
-                f"{reverse('bulk_availability', args=[match_pk])}"
-                f"?open={current_accordion}")
+    # Sort each list: in-team first, then alphabetically
+    def in_team_sort_key(p):
+        return (0 if p.is_selected else 1, p.name.lower())
 
-        elif action == 'remove_from_team':
-            for player_id in selected_ids:
-                match_player, created = MatchPlayer.objects.get_or_create(
-                    match=current_match,
-                    player_id=player_id,
-                    defaults={'availability': 'yes'}
-                )
-                match_player.selected = False
-                match_player.save()
-            messages.success(
-                request, f'{len(selected_ids)} player(s) removed from team.')
-            return redirect(
-                f"{reverse('bulk_availability', args=[match_pk])}"
-                f"?open={current_accordion}")
+    available_players.sort(key=in_team_sort_key)
+    maybe_players.sort(key=in_team_sort_key)
+    awaiting_players.sort(key=in_team_sort_key)
+    unavailable_players.sort(key=in_team_sort_key)
 
     # Get which accordion to open from URL param
     open_accordion = request.GET.get('open', 'availablePlayers')
@@ -675,37 +646,25 @@ def bulk_availability(request, match_pk):
 
 
 @login_required
-def match_list(request):
+@club_matches_condition
+async def match_list(request):
     """List all matches for user's club"""
-    from django.db.models import Case, When, Value, IntegerField
-
-    player = Player.objects.filter(user=request.user).first()
+    membership = await request.amembership()
+    player = membership.player
     if not player:
         return redirect('home')
 
-    matches = Match.objects.filter(club=player.club).annotate(
-        status_order=Case(
-            When(status='scheduled', then=Value(0)),
-            When(status='completed', then=Value(1)),
-            When(status='cancelled', then=Value(2)),
-            output_field=IntegerField(),
-        )
-    ).order_by('status_order', 'date')
-
-    # Get current user's availability and selection status for each match
-    for current_match in matches:
-        mp = MatchPlayer.objects.filter(
-            match=current_match, player=player).first()
-        current_match.my_availability = mp.availability if mp else None
-        current_match.is_selected = mp.selected if mp else False
-        current_match.selected_count = current_match.match_players.filter(
-            selected=True).count()
-        current_match.available_count = current_match.match_players.filter(
-            availability='yes', selected=False).count()
-        current_match.maybe_count = current_match.match_players.filter(
-            availability='maybe', selected=False).count()
-
-    is_admin_or_captain = player.club.is_admin_or_captain(request.user)
+    # Current user's availability, selection status and team counts
+    # for each match all come back in one query
+    matches = [
+        match async for match in Match.objects.for_club(
+            player.club_id
+        ).select_related(
+            'opposition'
+        ).with_player_status(player).in_display_order()
+    ]
+
+    is_admin_or_captain = membership.is_admin_or_captain(player.club_id)
     return render(request, 'clubs/match_list.html', {
         'matches': matches,
         'club': player.club,
@@ -714,14 +673,16 @@ def match_list(request):
 
 
 @login_required
-def player_list(request):
+async def player_list(request):
     """List all players for user's club"""
-    player = Player.objects.filter(user=request.user).first()
+    membership = await request.amembership()
+    player = membership.player
     if not player:
         return redirect('home')
 
-    players = Player.objects.filter(club=player.club, is_active=True)
-    is_admin_or_captain = player.club.is_admin_or_captain(request.user)
+    players = [
+        p async for p in Player.objects.for_club(player.club_id).active()]
+    is_admin_or_captain = membership.is_admin_or_captain(player.club_id)
     return render(request, 'clubs/player_list.html', {
         'players': players,
         'club': player.club,
@@ -730,55 +691,25 @@ def player_list(request):
 
 
 @login_required
+@club_matches_condition
 def my_availability(request):
     """Player updates their own availability across all matches"""
-    from django.db.models import Case, When, Value, IntegerField
-
-    player = Player.objects.filter(user=request.user).first()
+    player = request.membership.player
     if not player:
         return redirect('home')
 
-    matches = Match.objects.filter(club=player.club).annotate(
-        status_order=Case(
-            When(status='scheduled', then=Value(0)),
-            When(status='completed', then=Value(1)),
-            When(status='cancelled', then=Value(2)),
-            output_field=IntegerField(),
-        )
-    ).order_by('status_order', 'date')
-
     # Get current availability and selected count for each match
-    for current_match in matches:
-        mp = MatchPlayer.objects.filter(
-            match=current_match, player=player).first()
-        current_match.my_availability = mp.availability if mp else None
-        current_match.is_selected = mp.selected if mp else False
-        current_match.selected_count = MatchPlayer.objects.filter(
-            match=current_match, selected=True).count()
+    matches = Match.objects.for_club(player.club_id).select_related(
+        'opposition').with_player_status(player).in_display_order()
 
     if request.method == 'POST':
         match_ids = request.POST.getlist('matches')
         new_availability = request.POST.get('availability')
         team_action = request.POST.get('team_action')
 
-        for match_id in match_ids:
-            target_match = Match.objects.get(pk=match_id)
-            mp, created = MatchPlayer.objects.get_or_create(
-                match=target_match,
-                player=player,
-                defaults={'availability': 'maybe'}
-            )
-
-            if new_availability:
-                mp.availability = new_availability
-                mp.save()
-
-            if team_action == 'add':
-                mp.selected = True
-                mp.save()
-            elif team_action == 'remove':
-                mp.selected = False
-                mp.save()
+        # One bulk upsert for all ticked matches
+        apply_player_action(
+            player, match_ids, new_availability, team_action)
 
         if new_availability:
             messages.success(request, 'Availability updated successfully.')
@@ -789,7 +720,8 @@ def my_availability(request):
 
         return redirect('my_availability')
 
-    is_admin_or_captain = player.club.is_admin_or_captain(request.user)
+    is_admin_or_captain = request.membership.is_admin_or_captain(
+        player.club_id)
 
     return render(request, 'clubs/my_availability.html', {
         'matches': matches,
@@ -801,55 +733,24 @@ def my_availability(request):
 @login_required
 def player_availability(request, player_pk):
     """Admin/captain updates a player's availability across all matches"""
-    from django.db.models import Case, When, Value, IntegerField
-
     player = get_object_or_404(Player, pk=player_pk)
 
     # Permission check
-    if not player.club.is_admin_or_captain(request.user):
+    if not request.membership.is_admin_or_captain(player.club_id):
         raise PermissionDenied
 
-    matches = Match.objects.filter(club=player.club).annotate(
-        status_order=Case(
-            When(status='scheduled', then=Value(0)),
-            When(status='completed', then=Value(1)),
-            When(status='cancelled', then=Value(2)),
-            output_field=IntegerField(),
-        )
-    ).order_by('status_order', 'date')
-
     # Get current availability for each match
-    for current_match in matches:
-        mp = MatchPlayer.objects.filter(
-            match=current_match, player=player).first()
-        current_match.my_availability = mp.availability if mp else None
-        current_match.is_selected = mp.selected if mp else False
-        current_match.selected_count = MatchPlayer.objects.filter(
-            match=current_match, selected=True).count()
+    matches = Match.objects.for_club(player.club_id).select_related(
+        'opposition').with_player_status(player).in_display_order()
 
     if request.method == 'POST':
         match_ids = request.POST.getlist('matches')
         new_availability = request.POST.get('availability')
         team_action = request.POST.get('team_action')
 
-        for match_id in match_ids:
-            target_match = Match.objects.get(pk=match_id)
-            mp, created = MatchPlayer.objects.get_or_create(
-                match=target_match,
-                player=player,
-                defaults={'availability': 'maybe'}
-            )
-
-            if new_availability:
-                mp.availability = new_availability
-                mp.save()
-
-            if team_action == 'add':
-                mp.selected = True
-                mp.save()
-            elif team_action == 'remove':
-                mp.selected = False
-                mp.save()
+        # One bulk upsert for all ticked matches
+        apply_player_action(
+            player, match_ids, new_availability, team_action)
 
         if new_availability:
             messages.success(request, 'Availability updated successfully.')
@@ -865,3 +766,89 @@ def player_availability(request, player_pk):
         'player': player,
         'is_admin_view': True,
     })
+
+
+@login_required
+def fee_list(request):
+    """Outstanding fees for user's club - admin/captain only"""
+    player = request.membership.player
+    if not player:
+        return redirect('home')
+    if not request.membership.is_admin_or_captain(player.club_id):
+        raise PermissionDenied
+
+    # Balances are kept on the player row, so this is one indexed read
+    owing = list(Player.objects.for_club(player.club_id).filter(
+        fee_balance__gt=0
+    ).order_by('-fee_balance', 'name'))
+    return render(request, 'clubs/fee_list.html', {
+        'players': owing,
+        'club': player.club,
+        'total_owed': sum(p.fee_balance for p in owing),
+    })
+
+
+@login_required
+def payment_create(request, player_pk):
+    """Record a fee payment from a player"""
+    player = get_object_or_404(Player, pk=player_pk)
+    # Permission check - only admin/captain can record payments
+    if not request.membership.is_admin_or_captain(player.club_id):
+        raise PermissionDenied
+    if request.method == 'POST':
+        form = PaymentForm(request.POST)
+        if form.is_valid():
+            record_payment(
+                player, form.cleaned_data['amount'], request.user,
+                form.cleaned_data['note'])
+            messages.success(request, 'Payment recorded.')
+            return redirect('fee_list')
+    else:
+        form = PaymentForm(initial={'amount': player.fee_balance})
+    return render(request, 'clubs/payment_form.html', {
+        'form': form,
+        'player': player,
+    })
+
+
+@login_required
+def season_stats(request):
+    """Season statistics for every player in user's club"""
+    player = request.membership.player
+    if not player:
+        return redirect('home')
+    try:
+        season = int(request.GET.get('season', timezone.now().year))
+    except ValueError:
+        season = timezone.now().year
+
+    # Read from the precomputed summary table only
+    stats = list(PlayerSeasonStats.objects.filter(
+        club_id=player.club_id, season=season
+    ).select_related('player'))
+    if stats:
+        # Players added since the season was last refreshed have no row
+        # yet; with no responses, all their stats are zero
+        stats += [
+            PlayerSeasonStats(
+                player=newcomer, club_id=player.club_id, season=season,
+                matches=stats[0].matches)
+            for newcomer in Player.objects.for_club(player.club_id).active()
+            .exclude(season_stats__season=season)
+        ]
+    stats.sort(key=lambda row: (-row.appearances, row.player.name))
+    return render(request, 'clubs/season_stats.html', {
+        'stats': stats,
+        'club': player.club,
+        'season': season,
+        'is_admin_or_captain': request.membership.is_admin_or_captain(
+            player.club_id),
+    })
+
+
+@login_required
+def fragment_cache_stats(request):
+    """Hit/miss counters for the match fragment cache (staff only)"""
+    if not request.user.is_staff:
+        raise PermissionDenied
+    return JsonResponse(fragment_stats())
@@ -0,0 +1,21 @@
+"""
+Gunicorn settings, used by the Procfile.
+
+SERVER_MODE picks how the app is served:
+
+    wsgi (default)  sync workers running mfm_p4/wsgi.py
+    asgi            uvicorn workers running mfm_p4/asgi.py, so the async
+                    views don't hold a worker while they wait on the
+                    database, and live roster streams are available
+
+The worker count comes from WEB_CONCURRENCY as usual. Live roster
+streams only see changes made in their own process, so run ASGI with
+WEB_CONCURRENCY=1 if the team selection page should update live.
+"""
+import os
+
+if os.environ.get('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'mfm_p4.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'mfm_p4.wsgi:application'
@@ -0,0 +1,159 @@
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import (
+    iscoroutinefunction, markcoroutinefunction, sync_to_async,
+)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+logger = logging.getLogger('mfm_p4.sql')
+
+
+class QueryRecorder:
+    """execute_wrapper that times every query run during a request"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            self.queries.append((sql, duration))
+
+
+class QueryProfilingMiddleware:
+    """Per-request SQL profiling - opt in with SQL_PROFILING = True.
+
+    A sample of requests (SQL_PROFILING_SAMPLE_RATE) get one structured
+    log line with query count, SQL time and repeated statements (the N+1
+    fingerprint), plus a Server-Timing header. Queries slower than
+    SQL_PROFILING_SLOW_MS are logged individually.
+
+    Under ASGI an async view's queries run on the sync_to_async thread,
+    not the one handling the request, so the async path installs the
+    recorder from that thread too.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_PROFILING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SQL_PROFILING_SAMPLE_RATE', 1)
+        self.slow_ms = getattr(settings, 'SQL_PROFILING_SLOW_MS', 100)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        with self.recording(recorder):
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        self.report(request, response, recorder.queries, total_ms)
+        return response
+
+    async def __acall__(self, request):
+        if random.random() >= self.sample_rate:
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        # Thread sensitive, so this runs on the thread (and connections)
+        # that every sync_to_async call in the request uses
+        stack = await sync_to_async(self.recording)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        total_ms = (time.perf_counter() - start) * 1000
+
+        self.report(request, response, recorder.queries, total_ms)
+        return response
+
+    def recording(self, recorder):
+        """Wrap every connection on this thread with recorder until the
+        returned ExitStack is closed"""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(recorder))
+        return stack
+
+    def report(self, request, response, queries, total_ms):
+        sql_ms = sum(duration for sql, duration in queries)
+        # SQL is parameterised, so identical text means a repeated lookup
+        repeated = [
+            {'sql': sql, 'count': count}
+            for sql, count in Counter(sql for sql, _ in queries).items()
+            if count > 1
+        ]
+        match = request.resolver_match
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': len(queries),
+            'sql_ms': round(sql_ms, 2),
+            'total_ms': round(total_ms, 2),
+            'duplicates': repeated,
+        }))
+        for sql, duration in queries:
+            if duration >= self.slow_ms:
+                logger.warning(json.dumps({
+                    'slow_query_ms': round(duration, 2),
+                    'path': request.path,
+                    'sql': sql,
+                }))
+
+        response['Server-Timing'] = ', '.join([
+            f'sql;dur={sql_ms:.2f};desc="{len(queries)} queries"',
+            f'total;dur={total_ms:.2f}',
+        ])
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise that can also run in an async middleware chain.
+
+    Stock WhiteNoiseMiddleware is sync only, which under ASGI makes Django
+    push every request through a thread and back. Looking up and opening
+    a static file doesn't block for long, so the async path does it inline.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
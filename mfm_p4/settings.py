@@ -54,12 +54,15 @@ INSTALLED_APPS = [
 SITE_ID = 1  # Required for django-allauth
 
 MIDDLEWARE = [
+    'mfm_p4.middleware.QueryProfilingMiddleware',  # Opt-in SQL profiling
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',  # Serve static files on Heroku
+    # Serve static files on Heroku
+    'mfm_p4.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'clubs.middleware.MembershipMiddleware',  # Per-request club roles
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
@@ -101,6 +104,26 @@ if os.environ.get('DATABASE_URL'):
     DATABASES['default'] = dj_database_url.config(conn_max_age=600)
 
 
+# Caches - local memory by default so no external service is needed.
+# Rendered match fragments can use a file cache shared by all workers:
+# FRAGMENT_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# FRAGMENT_CACHE_LOCATION=/tmp/mfm-fragments
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragments': {
+        'BACKEND': os.environ.get(
+            'FRAGMENT_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get(
+            'FRAGMENT_CACHE_LOCATION', 'match-fragments'),
+        'TIMEOUT': 60 * 60 * 24,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 
@@ -160,4 +183,27 @@ ACCOUNT_EMAIL_VERIFICATION = 'optional'
 ACCOUNT_LOGOUT_ON_GET = True
 
 # Email settings (console for development - emails print to terminal)
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
\ No newline at end of file
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# SQL profiling (opt-in) - logs query counts per request to 'mfm_p4.sql'
+SQL_PROFILING = os.environ.get('SQL_PROFILING', 'False') == 'True'
+SQL_PROFILING_SAMPLE_RATE = float(
+    os.environ.get('SQL_PROFILING_SAMPLE_RATE', '1.0'))
+SQL_PROFILING_SLOW_MS = float(os.environ.get('SQL_PROFILING_SLOW_MS', '100'))
+
+# Background jobs (python manage.py run_jobs) - jobs run at once per
+# worker, and seconds before a running job is presumed abandoned
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', '2'))
+JOB_LOCK_TIMEOUT = int(os.environ.get('JOB_LOCK_TIMEOUT', '600'))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'mfm_p4.sql': {'handlers': ['console'], 'level': 'INFO'},
+        'clubs.jobs': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}